@@ -8,7 +8,9 @@ safety protocols, and semantic schema search.
 
 import os
 import sys
+import hashlib
 import logging
+import threading
 from pathlib import Path
 
 # 注册opengauss方言
@@ -51,6 +53,48 @@ def setup_logging(debug: bool = False):
     logging.getLogger('httpx').setLevel(logging.WARNING)
 
 
+# Memoized models keyed on (provider, model_id, base_url). Each entry stores a
+# digest of the API key instead of the key itself; a rotated key replaces the
+# entry, so stale clients are dropped rather than accumulating.
+_model_cache = {}
+_model_cache_lock = threading.Lock()
+
+
+def _get_model(provider: str, model_id: str, api_key: str, base_url: str = None):
+    """Return the memoized LLM model for a resolved provider configuration."""
+    cache_key = (provider, model_id, base_url)
+    key_digest = hashlib.sha256(api_key.encode("utf-8")).digest()
+    
+    with _model_cache_lock:
+        cached = _model_cache.get(cache_key)
+        if cached is not None and cached[0] == key_digest:
+            return cached[1]
+        
+        model = _create_model(provider, model_id, api_key, base_url)
+        _model_cache[cache_key] = (key_digest, model)
+        return model
+
+
+def _create_model(provider: str, model_id: str, api_key: str, base_url: str = None):
+    """Create the LLM model for a resolved provider configuration."""
+    if provider == "openai":
+        # Create OpenAI model with optional base_url
+        model_kwargs = {
+            "id": model_id,
+            "api_key": api_key
+        }
+        if base_url:
+            model_kwargs["base_url"] = base_url
+            logger.info(f"Using OpenAI-compatible API at: {base_url}")
+        
+        model = OpenAIChat(**model_kwargs)
+        logger.info(f"Using OpenAI model: {model_id}")
+    else:
+        model = Gemini(id=model_id, api_key=api_key)
+        logger.info(f"Using Gemini model: {model_id}")
+    return model
+
+
 def create_agent(debug: bool = False, enable_memory: bool = True, session_id: str = None, user_context: dict = None) -> Agent:
     """Create the AskDB Agno Agent with all tools and instructions.
     
@@ -72,27 +116,17 @@ def create_agent(debug: bool = False, enable_memory: bool = True, session_id: st
         
         model_id = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
         base_url = os.getenv("OPENAI_BASE_URL")
-        
-        # Create OpenAI model with optional base_url
-        model_kwargs = {
-            "id": model_id,
-            "api_key": api_key
-        }
-        if base_url:
-            model_kwargs["base_url"] = base_url
-            logger.info(f"Using OpenAI-compatible API at: {base_url}")
-        
-        model = OpenAIChat(**model_kwargs)
-        logger.info(f"Using OpenAI model: {model_id}")
     else:
         # Default to Gemini
+        llm_provider = "gemini"
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable not set")
         
         model_id = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-        model = Gemini(id=model_id, api_key=api_key)
-        logger.info(f"Using Gemini model: {model_id}")
+        base_url = None
+    
+    model = _get_model(llm_provider, model_id, api_key, base_url)
     
     # Setup session storage for conversation history
     storage_db = None
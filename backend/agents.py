@@ -3,8 +3,8 @@
  """
 
 import threading
+import time
 from typing import Dict, Optional
-from datetime import datetime, timedelta
 
 class AgentManager:
     """Manage agent sessions"""
@@ -12,6 +12,7 @@ class AgentManager:
     def __init__(self):
         self.agents: Dict[str, dict] = {}
         self.cleanup_interval = 300  # Cleanup every 5 minutes
+        self.session_ttl = 3600  # Expire sessions idle for 1 hour
         self._start_cleanup_thread()
     
     def _start_cleanup_thread(self):
@@ -26,7 +27,8 @@ class AgentManager:
     
     def _cleanup_old_sessions(self):
         """Clean up expired sessions"""
-        cutoff_time = datetime.now() - timedelta(hours=1)
+        # last_activity is a time.monotonic() reading, so this is a plain float compare
+        cutoff_time = time.monotonic() - self.session_ttl
         expired_sessions = [
             session_id for session_id, session_data in self.agents.items()
             if session_data['last_activity'] < cutoff_time
@@ -43,11 +45,11 @@ class AgentManager:
         if session_id not in self.agents:
             self.agents[session_id] = {
                 'agent': create_agent(enable_memory=use_memory, session_id=session_id, user_context=user_context),
-                'last_activity': datetime.now(),
+                'last_activity': time.monotonic(),
                 'user_context': user_context
             }
         else:
-            self.agents[session_id]['last_activity'] = datetime.now()
+            self.agents[session_id]['last_activity'] = time.monotonic()
             # 更新用户上下文（如果提供）
             if user_context:
                 self.agents[session_id]['user_context'] = user_context
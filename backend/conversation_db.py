@@ -4,6 +4,9 @@
 """
 
 import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
@@ -16,19 +19,137 @@ logger = logging.getLogger(__name__)
 DB_PATH = Path(__file__).parent.parent / "data" / "conversations.db"
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
+# metadata 列的默认值，绝大多数消息都是空字典
+EMPTY_METADATA = '{}'
+
+# 单条 SQL 中 IN (...) 绑定参数的上限（兼容旧版 SQLite 的 999 限制）
+MAX_SQL_PARAMS = 900
+
+# 用户会话列表查询，参数为 (username, limit)；
+# 活跃会话的查询应走 (username, is_active, updated_at DESC) 复合索引
+USER_CONVERSATIONS_SQL = '''
+    SELECT * FROM conversations 
+    WHERE username = ?
+    ORDER BY updated_at DESC
+    LIMIT ?
+'''
+ACTIVE_USER_CONVERSATIONS_SQL = '''
+    SELECT * FROM conversations 
+    WHERE username = ? AND is_active = 1
+    ORDER BY updated_at DESC
+    LIMIT ?
+'''
+
+
+def _load_metadata(raw: Optional[str]) -> Dict:
+    """解析 metadata 列，空值直接返回新字典而不走 JSON 解析"""
+    if not raw or raw == EMPTY_METADATA:
+        return {}
+    return json.loads(raw)
+
+
+class _ThreadConnection(sqlite3.Connection):
+    """
+    线程内复用的连接：调用方的 close() 只回滚未提交的事务，不真正关闭连接，
+    连接及其已编译语句缓存留给同一线程的下一次调用。
+    
+    处于 transaction() 块内（tx_depth > 0）时，各方法自己的 commit/rollback/close
+    以及 with conn 都不生效，由最外层事务统一提交或回滚。
+    """
+    
+    tx_depth = 0
+    
+    def commit(self):
+        if self.tx_depth == 0:
+            super().commit()
+    
+    def rollback(self):
+        if self.tx_depth == 0:
+            super().rollback()
+    
+    def close(self):
+        if self.tx_depth == 0 and self.in_transaction:
+            super().rollback()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.tx_depth == 0:
+            return super().__exit__(exc_type, exc_value, traceback)
+        return False
+    
+    def close_for_good(self):
+        """真正关闭连接（未提交的事务会被丢弃）"""
+        super().close()
+
+
+class _ConnectionHolder:
+    """
+    放在 threading.local 中持有线程的连接：线程结束时其线程局部数据被清理，
+    持有者随之释放并真正关闭连接，不会为已退出的线程留下打开的句柄
+    """
+    
+    __slots__ = ('conn',)
+    
+    def __init__(self, conn: _ThreadConnection):
+        self.conn = conn
+    
+    def __del__(self):
+        self.conn.close_for_good()
+
 
 class ConversationDB:
     """会话数据库管理类"""
     
     def __init__(self, db_path: Path = DB_PATH):
         self.db_path = db_path
+        # 每个线程各自的数据库连接
+        self._local = threading.local()
         self.init_database()
     
     def get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """
+        获取当前线程的数据库连接（首次调用时创建，之后复用）
+        
+        连接在线程结束时自动关闭；长期存活的线程（如 FastAPI 的线程池）会一直复用它，
+        也可以调用 close_thread_connection() 提前释放。
+        """
+        holder = getattr(self._local, 'connection', None)
+        if holder is None:
+            # 线程结束时的清理不一定在创建连接的线程中执行，因此关闭同线程检查；
+            # 连接本身只会被创建它的线程使用
+            conn = sqlite3.connect(self.db_path, factory=_ThreadConnection, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA cache_size=-20000')
+            holder = self._local.connection = _ConnectionHolder(conn)
+        return holder.conn
+    
+    def close_thread_connection(self):
+        """关闭当前线程的数据库连接，下次调用 get_connection() 时重新创建"""
+        holder = getattr(self._local, 'connection', None)
+        if holder is not None:
+            if holder.conn.tx_depth:
+                raise RuntimeError("不能在 transaction() 块内关闭连接")
+            del self._local.connection
+    
+    @contextmanager
+    def transaction(self):
+        """
+        外层事务：块内的所有读写共用当前线程的连接，退出时只提交一次
+        
+        块内抛出异常时整体回滚。可以嵌套使用，只有最外层负责提交。
+        """
+        conn = self.get_connection()
+        conn.tx_depth += 1
+        try:
+            yield conn
+        except BaseException:
+            conn.tx_depth -= 1
+            if conn.tx_depth == 0:
+                conn.rollback()
+            raise
+        else:
+            conn.tx_depth -= 1
+            if conn.tx_depth == 0:
+                conn.commit()
     
     def init_database(self):
         """初始化数据库表结构"""
@@ -45,6 +166,8 @@ class ConversationDB:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 message_count INTEGER DEFAULT 0,
+                user_message_count INTEGER DEFAULT 0,
+                assistant_message_count INTEGER DEFAULT 0,
                 is_active BOOLEAN DEFAULT 1,
                 metadata TEXT DEFAULT '{}'
             )
@@ -63,6 +186,9 @@ class ConversationDB:
             )
         ''')
         
+        # 兼容旧库：补充按角色的消息计数列并回填
+        self._ensure_role_counters(cursor)
+        
         # 创建索引以提高查询性能
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_conversations_user 
@@ -74,10 +200,43 @@ class ConversationDB:
             ON messages(conversation_id, created_at ASC)
         ''')
         
+        # cleanup_old_conversations 按 (is_active, updated_at) 范围删除，只触及过期的会话
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_conversations_expiry 
+            ON conversations(is_active, updated_at)
+        ''')
+        
         conn.commit()
         conn.close()
         logger.info("✅ 会话数据库初始化完成")
     
+    def _ensure_role_counters(self, cursor):
+        """为旧版 conversations 表添加按角色的消息计数列"""
+        cursor.execute('PRAGMA table_info(conversations)')
+        columns = {row['name'] for row in cursor.fetchall()}
+        
+        missing = [
+            (column, role)
+            for column, role in (
+                ('user_message_count', 'user'),
+                ('assistant_message_count', 'assistant'),
+            )
+            if column not in columns
+        ]
+        
+        for column, role in missing:
+            cursor.execute(f'ALTER TABLE conversations ADD COLUMN {column} INTEGER DEFAULT 0')
+            cursor.execute(f'''
+                UPDATE conversations
+                SET {column} = (
+                    SELECT COUNT(*) FROM messages
+                    WHERE messages.conversation_id = conversations.id AND messages.role = ?
+                )
+            ''', (role,))
+        
+        if missing:
+            logger.info(f"已补充会话计数列: {', '.join(column for column, _ in missing)}")
+    
     def create_conversation(
         self, 
         conversation_id: str,
@@ -120,6 +279,68 @@ class ConversationDB:
         finally:
             conn.close()
     
+    def bulk_create(
+        self,
+        conversations: List[tuple],
+        messages: List[tuple] = None
+    ) -> int:
+        """
+        在一个事务中批量创建会话及其消息
+        
+        Args:
+            conversations: (conversation_id, user_id, username, title) 元组列表
+            messages: (conversation_id, role, content) 元组列表，按时间顺序排列
+            
+        Returns:
+            创建的会话数量
+        """
+        messages = messages or []
+        
+        # 预先统计各会话的消息数，插入会话时直接写入计数列
+        counts = {row[0]: [0, 0, 0] for row in conversations}
+        for conversation_id, role, _ in messages:
+            counter = counts.get(conversation_id)
+            if counter is None:
+                raise ValueError(f"会话不存在: {conversation_id}")
+            counter[0] += 1
+            counter[1] += role == 'user'
+            counter[2] += role == 'assistant'
+        
+        conn = self.get_connection()
+        
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO conversations (
+                        id, user_id, username, title, metadata,
+                        message_count, user_message_count, assistant_message_count
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (conversation_id, user_id, username, title, EMPTY_METADATA, *counts[conversation_id])
+                    for conversation_id, user_id, username, title in conversations
+                ])
+                
+                conn.executemany('''
+                    INSERT INTO messages (conversation_id, role, content, metadata)
+                    VALUES (?, ?, ?, ?)
+                ''', [
+                    (conversation_id, role, content, EMPTY_METADATA)
+                    for conversation_id, role, content in messages
+                ])
+            
+            logger.info(f"✅ 批量创建 {len(conversations)} 个会话，{len(messages)} 条消息")
+            return len(conversations)
+            
+        except sqlite3.IntegrityError as e:
+            logger.error(f"批量创建会话失败: {e}")
+            raise ValueError(f"批量创建会话失败: {e}")
+        except Exception as e:
+            logger.error(f"批量创建会话失败: {e}")
+            raise
+        finally:
+            conn.close()
+    
     def get_user_conversations(
         self, 
         username: str, 
@@ -131,26 +352,14 @@ class ConversationDB:
         cursor = conn.cursor()
         
         try:
-            if include_inactive:
-                cursor.execute('''
-                    SELECT * FROM conversations 
-                    WHERE username = ?
-                    ORDER BY updated_at DESC
-                    LIMIT ?
-                ''', (username, limit))
-            else:
-                cursor.execute('''
-                    SELECT * FROM conversations 
-                    WHERE username = ? AND is_active = 1
-                    ORDER BY updated_at DESC
-                    LIMIT ?
-                ''', (username, limit))
+            sql = USER_CONVERSATIONS_SQL if include_inactive else ACTIVE_USER_CONVERSATIONS_SQL
+            cursor.execute(sql, (username, limit))
             
             conversations = [dict(row) for row in cursor.fetchall()]
             
             # 解析metadata
             for conv in conversations:
-                conv['metadata'] = json.loads(conv.get('metadata', '{}'))
+                conv['metadata'] = _load_metadata(conv.get('metadata'))
             
             return conversations
             
@@ -177,7 +386,7 @@ class ConversationDB:
                 return None
             
             conversation = dict(row)
-            conversation['metadata'] = json.loads(conversation.get('metadata', '{}'))
+            conversation['metadata'] = _load_metadata(conversation.get('metadata'))
             return conversation
             
         finally:
@@ -271,7 +480,7 @@ class ConversationDB:
         content: str,
         metadata: Dict = None
     ) -> Dict:
-        """添加消息到会话"""
+        """添加消息到会话（处于 transaction() 中时由外层事务统一提交）"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -289,20 +498,22 @@ class ConversationDB:
             
             message_id = cursor.lastrowid
             
-            # 更新会话的消息计数和更新时间
+            # 增量更新会话的消息计数和更新时间，统计时无需再扫描消息表
             cursor.execute('''
                 UPDATE conversations 
                 SET message_count = message_count + 1,
+                    user_message_count = user_message_count + (? = 'user'),
+                    assistant_message_count = assistant_message_count + (? = 'assistant'),
                     updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
-            ''', (conversation_id,))
+            ''', (role, role, conversation_id))
             
             conn.commit()
             
             # 获取插入的消息
             cursor.execute('SELECT * FROM messages WHERE id = ?', (message_id,))
             message = dict(cursor.fetchone())
-            message['metadata'] = json.loads(message.get('metadata', '{}'))
+            message['metadata'] = _load_metadata(message.get('metadata'))
             
             return message
             
@@ -348,31 +559,69 @@ class ConversationDB:
             
             # 解析metadata
             for msg in messages:
-                msg['metadata'] = json.loads(msg.get('metadata', '{}'))
+                msg['metadata'] = _load_metadata(msg.get('metadata'))
             
             return messages
             
         finally:
             conn.close()
     
+    def get_messages_for_conversations(self, conversation_ids: List[str]) -> Dict[str, List[Dict]]:
+        """一次查询获取多个会话的消息，按会话ID分组返回"""
+        grouped = defaultdict(list)
+        if not conversation_ids:
+            return {}
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # SQLite 对绑定参数数量有限制，超长列表分批查询
+            for start in range(0, len(conversation_ids), MAX_SQL_PARAMS):
+                batch = conversation_ids[start:start + MAX_SQL_PARAMS]
+                placeholders = ','.join('?' * len(batch))
+                cursor.execute(f'''
+                    SELECT * FROM messages 
+                    WHERE conversation_id IN ({placeholders})
+                    ORDER BY conversation_id, created_at ASC
+                ''', batch)
+                
+                for row in cursor.fetchall():
+                    msg = dict(row)
+                    msg['metadata'] = _load_metadata(msg.get('metadata'))
+                    grouped[msg['conversation_id']].append(msg)
+            
+            return {conversation_id: grouped.get(conversation_id, []) for conversation_id in conversation_ids}
+            
+        finally:
+            conn.close()
+    
     def get_conversation_stats(self, conversation_id: str) -> Dict:
         """获取会话统计信息"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
+            # 计数直接读取 add_message 维护的累计值；首末时间走 idx_messages_conversation 索引
             cursor.execute('''
                 SELECT 
-                    COUNT(*) as total_messages,
-                    COALESCE(SUM(CASE WHEN role = 'user' THEN 1 ELSE 0 END), 0) as user_messages,
-                    COALESCE(SUM(CASE WHEN role = 'assistant' THEN 1 ELSE 0 END), 0) as assistant_messages,
-                    MIN(created_at) as first_message_at,
-                    MAX(created_at) as last_message_at
-                FROM messages
-                WHERE conversation_id = ?
+                    c.message_count as total_messages,
+                    c.user_message_count as user_messages,
+                    c.assistant_message_count as assistant_messages,
+                    (SELECT MIN(created_at) FROM messages WHERE conversation_id = c.id) as first_message_at,
+                    (SELECT MAX(created_at) FROM messages WHERE conversation_id = c.id) as last_message_at
+                FROM conversations c
+                WHERE c.id = ?
             ''', (conversation_id,))
             
-            stats = dict(cursor.fetchone())
+            row = cursor.fetchone()
+            stats = dict(row) if row else {
+                'total_messages': 0,
+                'user_messages': 0,
+                'assistant_messages': 0,
+                'first_message_at': None,
+                'last_message_at': None
+            }
             # 确保数值字段不为 None
             stats['user_messages'] = stats.get('user_messages') or 0
             stats['assistant_messages'] = stats.get('assistant_messages') or 0
@@ -403,8 +652,16 @@ class ConversationDB:
             # 截取前30个字符作为标题
             title = content[:30] + ('...' if len(content) > 30 else '')
             
-            # 更新标题
-            self.update_conversation_title(conversation_id, title)
+            # 标题未变化时跳过写入，避免无意义地刷新 updated_at
+            cursor.execute('''
+                UPDATE conversations 
+                SET title = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND title != ?
+            ''', (title, conversation_id, title))
+            conn.commit()
+            
+            if cursor.rowcount > 0:
+                logger.info(f"更新会话标题: {conversation_id} -> {title}")
             
             return title
             
@@ -15,6 +15,7 @@ from typing import Optional, Dict, Any, List
 import logging
 import hashlib
 import re
+import time
 import jwt
 
 # 修复导入路径
@@ -31,6 +32,8 @@ import json
 import asyncio
 from typing import AsyncGenerator
 
+from backend.tool_calls import extract_response_tool_calls
+
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -83,6 +86,10 @@ EMAIL_CONFIG = {
 DEV_MODE = os.getenv("DEV_MODE", "true").lower() == "true"  # 开发模式，跳过验证码验证
 SKIP_EMAIL_VERIFICATION = DEV_MODE  # 开发模式下跳过邮箱验证
 
+# 流式输出配置：合并细碎的内容增量后再发送，减少 SSE 帧数
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "64"))  # 缓冲达到该字符数即发送
+STREAM_FLUSH_INTERVAL = int(os.getenv("STREAM_FLUSH_MS", "50")) / 1000  # 距上次发送超过该时长即发送
+
 # 验证码存储（仍然使用内存存储，因为验证码是短期的）
 verification_codes: Dict[str, Dict] = {}
 
@@ -243,6 +250,14 @@ class VectorSearchResponse(BaseModel):
     total: int
     message: Optional[str] = None
 
+class VectorSearchBatchRequest(BaseModel):
+    queries: List[VectorSearchRequest]
+
+class VectorSearchBatchResponse(BaseModel):
+    success: bool
+    results: List[VectorSearchResponse]
+    message: Optional[str] = None
+
 class ConfirmActionRequest(BaseModel):
     session_id: str
     sql: str
@@ -522,25 +537,7 @@ def process_chat_message(message: str, session_id: str = "web-session", user_con
         ai_response = response.content
         
         # 提取工具调用信息
-        tool_calls = []
-        if hasattr(response, 'messages') and response.messages:
-            for msg in response.messages:
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    for call in msg.tool_calls:
-                        if hasattr(call, 'function'):
-                            func = call.function
-                            # 解析参数（可能是字符串或字典）
-                            args = func.arguments
-                            if isinstance(args, str):
-                                try:
-                                    args = json.loads(args)
-                                except:
-                                    pass
-                            
-                            tool_calls.append({
-                                'name': func.name,
-                                'arguments': args
-                            })
+        tool_calls = extract_response_tool_calls(response)
         
         # 保存AI响应到数据库（包含工具调用信息）
         if conversation_db:
@@ -657,6 +654,9 @@ async def process_chat_message_stream(message: str, session_id: str, user_contex
         full_response = []
         tool_calls_info = []
         current_content_length = 0  # 记录当前内容长度
+        pending_content = []  # 尚未发送的内容增量
+        pending_chars = 0
+        last_flush = time.monotonic()
         
         logger.info(f"开始处理流式事件，stream_events=True")
         
@@ -667,18 +667,30 @@ async def process_chat_message_stream(message: str, session_id: str, user_contex
             event_type = getattr(chunk, 'event', 'unknown')
             logger.info(f"[事件 {event_count}] {event_type}")
             
-            # 处理内容流
+            # 处理内容流：先缓冲，攒够字符数、超过间隔或遇到换行时再合并发送
             if chunk.event == RunEvent.run_content:
                 content = chunk.content
-                if content:
-                    full_response.append(content)
-                    current_content_length += len(content)  # 更新长度
-                    # 实时发送内容块
-                    yield f"data: {json.dumps({'type': 'content', 'content': content}, ensure_ascii=False)}\n\n"
-                    await asyncio.sleep(0.001)  # 微小延迟以避免过载
+                if not content:
+                    continue
+                full_response.append(content)
+                current_content_length += len(content)  # 更新长度
+                pending_content.append(content)
+                pending_chars += len(content)
+                if (pending_chars < STREAM_FLUSH_CHARS
+                        and time.monotonic() - last_flush < STREAM_FLUSH_INTERVAL
+                        and not content.endswith('\n')):
+                    continue
+            
+            # 发送缓冲的内容（工具事件之前必须先发出，保证前端的插入位置正确）
+            if pending_content:
+                yield f"data: {json.dumps({'type': 'content', 'content': ''.join(pending_content)}, ensure_ascii=False)}\n\n"
+                pending_content.clear()
+                pending_chars = 0
+                last_flush = time.monotonic()
+                await asyncio.sleep(0.001)  # 微小延迟以避免过载
             
             # 处理工具调用开始事件
-            elif chunk.event == RunEvent.tool_call_started:
+            if chunk.event == RunEvent.tool_call_started:
                 logger.info(f"🔧 工具调用开始！")
                 tool_name = getattr(chunk.tool, 'tool_name', '')
                 tool_args = getattr(chunk.tool, 'tool_args', {})
@@ -749,6 +761,11 @@ async def process_chat_message_stream(message: str, session_id: str, user_contex
                         tc['status'] = 'completed'
                         break
         
+        # 发送剩余的缓冲内容
+        if pending_content:
+            yield f"data: {json.dumps({'type': 'content', 'content': ''.join(pending_content)}, ensure_ascii=False)}\n\n"
+            await asyncio.sleep(0.001)
+        
         # 组装完整响应
         ai_response = ''.join(full_response)
         
@@ -807,8 +824,9 @@ async def process_chat_message_stream(message: str, session_id: str, user_contex
                 logger.info(f"📝 当前查询: {message[:50]}...")
                 logger.info(f"📝 AI回答长度: {len(ai_response)} 字符")
                 
-                # 生成推荐
-                recommendations = query_recommender.generate_recommendations(
+                # 生成推荐（同步的 LLM 调用放到线程中执行，避免阻塞事件循环）
+                recommendations = await asyncio.to_thread(
+                    query_recommender.generate_recommendations,
                     current_query=message,
                     current_answer=ai_response,
                     conversation_history=conversation_history,
@@ -1574,6 +1592,26 @@ async def confirm_dangerous_action(
             detail=f"操作失败: {str(e)}"
         )
 
+def build_vector_search_response(query: str, search_results: list) -> VectorSearchResponse:
+    """把 VectorStore 的搜索结果转换为接口响应格式"""
+    result_items = [
+        SearchResultItem(
+            name=result.name,
+            type=result.item_type,
+            similarity=round(result.similarity, 4),
+            metadata=result.metadata
+        )
+        for result in search_results
+    ]
+    
+    return VectorSearchResponse(
+        success=True,
+        query=query,
+        results=result_items,
+        total=len(result_items),
+        message=f"找到 {len(result_items)} 个相关结果"
+    )
+
 @app.post("/api/protected/vector/search", response_model=VectorSearchResponse)
 async def vector_search(
     request: VectorSearchRequest,
@@ -1626,26 +1664,64 @@ async def vector_search(
             search_types=request.search_types
         )
         
-        # 转换结果格式
-        result_items = []
-        for result in search_results:
-            result_items.append(SearchResultItem(
-                name=result.name,
-                type=result.item_type,
-                similarity=round(result.similarity, 4),
-                metadata=result.metadata
-            ))
+        return build_vector_search_response(request.query, search_results)
+        
+    except Exception as e:
+        logger.error(f"Vector search failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"搜索失败: {str(e)}"
+        )
+
+@app.post("/api/protected/vector/search_batch", response_model=VectorSearchBatchResponse)
+async def vector_search_batch(
+    request: VectorSearchBatchRequest,
+    user: Dict = Depends(verify_token)
+):
+    """
+    批量向量语义搜索API
+    
+    一次请求执行多个搜索，所有查询文本一起编码，每类索引只检索一次。
+    
+    参数:
+        - queries: 搜索请求列表，每项与 /api/protected/vector/search 的参数相同
+    
+    返回:
+        与 queries 顺序一致的搜索结果列表
+    """
+    if not HAS_AGENT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="向量搜索服务未加载"
+        )
+    
+    try:
+        stats = vector_store.get_index_stats()
+        total_indexed = stats.get("tables", 0) + stats.get("columns", 0) + stats.get("business_terms", 0)
+        
+        if total_indexed == 0:
+            return VectorSearchBatchResponse(
+                success=False,
+                results=[],
+                message="索引为空，请先进行索引操作"
+            )
         
-        return VectorSearchResponse(
+        batch_results = vector_store.search_batch([
+            {"query": q.query, "top_k": q.top_k, "search_types": q.search_types}
+            for q in request.queries
+        ])
+        
+        return VectorSearchBatchResponse(
             success=True,
-            query=request.query,
-            results=result_items,
-            total=len(result_items),
-            message=f"找到 {len(result_items)} 个相关结果"
+            results=[
+                build_vector_search_response(q.query, search_results)
+                for q, search_results in zip(request.queries, batch_results)
+            ],
+            message=f"完成 {len(request.queries)} 个搜索"
         )
         
     except Exception as e:
-        logger.error(f"Vector search failed: {e}")
+        logger.error(f"Batch vector search failed: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"搜索失败: {str(e)}"
@@ -7,6 +7,7 @@
 import sqlite3
 from pathlib import Path
 import logging
+from functools import lru_cache
 from typing import Dict, List
 import re
 import json
@@ -21,8 +22,9 @@ NEW_DB_PATH = Path(__file__).parent.parent / "data" / "conversations.db"
 USERS_DB_PATH = Path(__file__).parent.parent / "data" / "users.db"
 
 
+@lru_cache(maxsize=None)
 def get_user_id_by_username(username: str) -> int:
-    """从users.db获取用户ID"""
+    """从users.db获取用户ID（同一用户的多个会话只查询一次）"""
     if not USERS_DB_PATH.exists():
         logger.warning(f"用户数据库不存在: {USERS_DB_PATH}")
         return 999  # 默认ID
@@ -161,30 +163,36 @@ def migrate_conversations():
                 created_at = datetime.fromtimestamp(created_at_ts).strftime('%Y-%m-%d %H:%M:%S')
                 updated_at = datetime.fromtimestamp(updated_at_ts).strftime('%Y-%m-%d %H:%M:%S')
                 
-                # 创建会话
-                new_cursor.execute("""
-                    INSERT INTO conversations 
-                    (id, user_id, username, title, created_at, updated_at, message_count, is_active, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?, 0, 1, '{}')
-                """, (session_id, user_id, username, title, created_at, updated_at))
-                
-                # 迁移消息
-                message_count = 0
+                # 一次性准备好所有消息行（同一个 run 内的消息共享时间戳，只格式化一次）
+                formatted_times = {}
+                message_rows = []
                 for msg in all_messages:
-                    msg_time = datetime.fromtimestamp(msg['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
-                    new_cursor.execute("""
-                        INSERT INTO messages 
-                        (conversation_id, role, content, created_at, metadata)
-                        VALUES (?, ?, ?, ?, '{}')
-                    """, (session_id, msg['role'], msg['content'], msg_time))
-                    message_count += 1
+                    msg_time = formatted_times.get(msg['timestamp'])
+                    if msg_time is None:
+                        msg_time = datetime.fromtimestamp(msg['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+                        formatted_times[msg['timestamp']] = msg_time
+                    message_rows.append((session_id, msg['role'], msg['content'], msg_time))
                 
-                # 更新消息计数
+                message_count = len(message_rows)
+                user_message_count = sum(1 for msg in all_messages if msg['role'] == 'user')
+                
+                # 创建会话（计数已知，无需事后再 UPDATE）
                 new_cursor.execute("""
-                    UPDATE conversations 
-                    SET message_count = ?
-                    WHERE id = ?
-                """, (message_count, session_id))
+                    INSERT INTO conversations 
+                    (id, user_id, username, title, created_at, updated_at,
+                     message_count, user_message_count, assistant_message_count, is_active, metadata)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, '{}')
+                """, (
+                    session_id, user_id, username, title, created_at, updated_at,
+                    message_count, user_message_count, message_count - user_message_count
+                ))
+                
+                # 批量迁移消息
+                new_cursor.executemany("""
+                    INSERT INTO messages 
+                    (conversation_id, role, content, created_at, metadata)
+                    VALUES (?, ?, ?, ?, '{}')
+                """, message_rows)
                 
                 logger.info(f"✅ 迁移会话: {session_id} ({message_count} 条消息)")
                 migrated_count += 1
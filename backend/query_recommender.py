@@ -6,18 +6,59 @@
 
 import os
 import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 from typing import List, Dict, Optional
 import json
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
 
+try:
+    import orjson  # 可选依赖，存在时用于更快地生成缓存键
+except ImportError:
+    orjson = None
+
+try:
+    import diskcache  # 可选依赖，存在时推荐缓存可跨进程/重启复用
+except ImportError:
+    diskcache = None
+
 # 加载环境变量
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path, override=True)
 
 logger = logging.getLogger(__name__)
 
+# 推荐用的系统提示词（固定不变，模块加载时构建一次）
+RECOMMENDER_SYSTEM_PROMPT = """你是一个智能查询推荐助手。
+
+你的任务：基于用户刚刚的数据库查询和 AI 的回答，推荐 3 个用户可能感兴趣的**下一步查询**。
+
+推荐原则：
+1. **紧密相关** - 推荐应该是当前查询的自然延伸或深入
+2. **循序渐进** - 从简单到复杂，从概览到细节
+3. **实用性强** - 推荐的查询应该能带来新的业务洞察
+4. **表达清晰** - 使用自然语言，像用户会说的那样
+
+推荐类型（优先级从高到低）：
+- 深入分析：对当前结果进一步细分、过滤、排序
+- 关联探索：查看相关的表、维度、指标
+- 时间对比：不同时间段的对比分析
+- 异常检查：查找异常值、边界情况
+- 趋势分析：查看变化趋势、增长率
+
+输出格式：
+直接输出 3 行，每行一个推荐查询，不要编号，不要其他说明文字。
+例如：
+查看订单的详细分布情况
+分析用户的地域分布
+统计最近一个月的销售趋势
+
+重要：只输出 3 行推荐，每行一个，不要任何其他内容！"""
+
 
 class QueryRecommender:
     """查询推荐器 - 使用独立的 LLM 生成推荐"""
@@ -35,17 +76,55 @@ class QueryRecommender:
             return
         
         # 创建 OpenAI client
-        client_kwargs = {"api_key": api_key}
+        # SDK 自带指数退避+抖动重试，只重试连接错误、超时、429 和 5xx，不重试其它 4xx
+        client_kwargs = {
+            "api_key": api_key,
+            "max_retries": int(os.getenv("RECOMMENDER_MAX_RETRIES", "2"))
+        }
         if base_url:
             client_kwargs["base_url"] = base_url
-            logger.info(f"使用 OpenAI 兼容 API: {base_url}")
+            logger.info("使用 OpenAI 兼容 API: %s", base_url)
         
         self.client = OpenAI(**client_kwargs)
         
+        # 完全相同的请求直接复用上一次的推荐结果（LRU）
+        self._cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_size = int(os.getenv("RECOMMENDER_CACHE_SIZE", "128"))
+        
+        # 正在进行中的相同请求只调用一次 LLM，其余调用方等待同一个结果
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # 内存缓存之下的磁盘缓存，多 worker 之间共享，进程重启后仍然有效
+        # 需显式设置 RECOMMENDER_CACHE_DIR 才启用（如 data/recommender_cache，data/ 已被 git 忽略），
+        # 条目在 RECOMMENDER_CACHE_TTL 秒后过期（设为 0 则不过期），避免库结构变化后仍返回旧推荐
+        self._disk_cache = None
+        self._disk_cache_ttl = int(os.getenv("RECOMMENDER_CACHE_TTL", str(24 * 3600))) or None
+        cache_dir = os.getenv("RECOMMENDER_CACHE_DIR")
+        if cache_dir and diskcache is not None and self._cache_size > 0:
+            try:
+                self._disk_cache = diskcache.Cache(
+                    cache_dir,
+                    size_limit=int(os.getenv("RECOMMENDER_CACHE_BYTES", str(64 * 1024 * 1024)))
+                )
+                logger.info("推荐磁盘缓存已启用: %s", cache_dir)
+            except Exception as e:
+                logger.warning("推荐磁盘缓存不可用，仅使用内存缓存: %s", e)
+        
         # 使用与主Agent相同的模型，或使用环境变量指定的推荐模型
         self.model = os.getenv("RECOMMENDER_MODEL") or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
         
-        logger.info(f"✅ QueryRecommender 初始化成功，使用模型: {self.model}")
+        # 请求中与本次对话无关的部分只构建一次
+        self._system_message = {"role": "system", "content": RECOMMENDER_SYSTEM_PROMPT}
+        self._base_params = {
+            "model": self.model,
+            "temperature": 0.7,
+            "max_tokens": 500,
+            "timeout": 10  # 10秒超时
+        }
+        
+        logger.info("✅ QueryRecommender 初始化成功，使用模型: %s", self.model)
     
     def generate_recommendations(
         self, 
@@ -71,33 +150,6 @@ class QueryRecommender:
             return []
         
         try:
-            # 构建 prompt
-            system_prompt = """你是一个智能查询推荐助手。
-
-你的任务：基于用户刚刚的数据库查询和 AI 的回答，推荐 3 个用户可能感兴趣的**下一步查询**。
-
-推荐原则：
-1. **紧密相关** - 推荐应该是当前查询的自然延伸或深入
-2. **循序渐进** - 从简单到复杂，从概览到细节
-3. **实用性强** - 推荐的查询应该能带来新的业务洞察
-4. **表达清晰** - 使用自然语言，像用户会说的那样
-
-推荐类型（优先级从高到低）：
-- 深入分析：对当前结果进一步细分、过滤、排序
-- 关联探索：查看相关的表、维度、指标
-- 时间对比：不同时间段的对比分析
-- 异常检查：查找异常值、边界情况
-- 趋势分析：查看变化趋势、增长率
-
-输出格式：
-直接输出 3 行，每行一个推荐查询，不要编号，不要其他说明文字。
-例如：
-查看订单的详细分布情况
-分析用户的地域分布
-统计最近一个月的销售趋势
-
-重要：只输出 3 行推荐，每行一个，不要任何其他内容！"""
-            
             # 构建用户消息
             user_message = f"""当前查询: {current_query}
 
@@ -105,46 +157,120 @@ AI 的回答: {current_answer[:500]}{'...' if len(current_answer) > 500 else ''}
             
             # 如果有历史对话，添加上下文
             if conversation_history and len(conversation_history) > 0:
-                history_text = "\n\n最近的对话历史:\n"
-                # 只取最近 3 轮对话
-                recent_history = conversation_history[-6:] if len(conversation_history) > 6 else conversation_history
-                for msg in recent_history:
-                    role = "用户" if msg["role"] == "user" else "AI"
-                    content = msg["content"][:100] + "..." if len(msg["content"]) > 100 else msg["content"]
-                    history_text += f"{role}: {content}\n"
-                user_message = history_text + "\n" + user_message
+                # 只取最近 3 轮对话，一次性拼接，避免循环中反复创建字符串
+                history_lines = [
+                    f"{'用户' if msg['role'] == 'user' else 'AI'}: "
+                    f"{msg['content'][:100] + '...' if len(msg['content']) > 100 else msg['content']}\n"
+                    for msg in conversation_history[-6:]
+                ]
+                user_message = "".join(("\n\n最近的对话历史:\n", *history_lines, "\n", user_message, "\n\n请推荐 3 个下一步可能的查询："))
+            else:
+                user_message += "\n\n请推荐 3 个下一步可能的查询："
             
-            user_message += "\n\n请推荐 3 个下一步可能的查询："
+            cache_key = self._cache_key(user_message, max_recommendations)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("✅ 命中推荐缓存: %s", cached)
+                return cached
             
-            # 调用 LLM
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=0.7,
-                max_tokens=500,
-                timeout=10  # 10秒超时
-            )
+            with self._inflight_lock:
+                future = self._inflight.get(cache_key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._inflight[cache_key] = future
             
-            # 解析响应
-            content = response.choices[0].message.content.strip()
+            if not owner:
+                logger.info("⏳ 相同的推荐请求正在进行，等待其结果")
+                return list(future.result())
             
-            # 按行分割，提取推荐
-            recommendations = self._extract_recommendations_from_text(content, max_recommendations)
+            try:
+                recommendations = self._request_recommendations(user_message, max_recommendations)
+                if recommendations:
+                    self._cache_set(cache_key, recommendations)
+                future.set_result(recommendations)
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(cache_key, None)
             
-            if recommendations:
-                logger.info(f"✅ 生成了 {len(recommendations)} 条推荐: {recommendations}")
-            else:
-                logger.warning(f"⚠️ 未能提取到推荐，原始内容: {content[:200]}")
-            
-            return recommendations
+            return list(recommendations)
         
         except Exception as e:
-            logger.error(f"生成推荐失败: {e}")
+            logger.error("生成推荐失败: %s", e)
             return []
     
+    def _request_recommendations(self, user_message: str, max_recommendations: int) -> List[str]:
+        """调用 LLM 并解析出推荐查询"""
+        response = self.client.chat.completions.create(
+            messages=[self._system_message, {"role": "user", "content": user_message}],
+            **self._base_params
+        )
+        
+        # 解析响应
+        content = response.choices[0].message.content.strip()
+        
+        # 按行分割，提取推荐
+        recommendations = self._extract_recommendations_from_text(content, max_recommendations)
+        
+        if recommendations:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("✅ 生成了 %d 条推荐: %s", len(recommendations), recommendations)
+        else:
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning("⚠️ 未能提取到推荐，原始内容: %s", content[:200])
+        
+        return recommendations
+    
+    def _cache_key(self, user_message: str, max_count: int) -> str:
+        """根据模型和用户消息生成缓存键（系统提示词是模块常量，无需参与）"""
+        request = {"model": self.model, "user": user_message, "max": max_count}
+        if orjson is not None:
+            payload = orjson.dumps(request, option=orjson.OPT_SORT_KEYS)
+        else:
+            payload = json.dumps(request, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[List[str]]:
+        """读取缓存（先内存后磁盘），命中时返回副本"""
+        with self._cache_lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+                return list(value)
+        
+        if self._disk_cache is None:
+            return None
+        try:
+            value = self._disk_cache.get(key)
+        except Exception as e:
+            logger.warning("读取推荐磁盘缓存失败: %s", e)
+            return None
+        if value is None:
+            return None
+        # 回填内存缓存
+        self._cache_set(key, value, persist=False)
+        return list(value)
+    
+    def _cache_set(self, key: str, value: List[str], persist: bool = True):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if self._cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = list(value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        
+        if persist and self._disk_cache is not None:
+            try:
+                self._disk_cache.set(key, list(value), expire=self._disk_cache_ttl)
+            except Exception as e:
+                logger.warning("写入推荐磁盘缓存失败: %s", e)
+    
     def _extract_recommendations_from_text(self, text: str, max_count: int) -> List[str]:
         """
         从文本中提取推荐查询（每行一个）
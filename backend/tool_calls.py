@@ -0,0 +1,50 @@
+"""
+工具调用信息提取
+从 Agent 非流式运行结果的消息中提取工具调用的名称和参数，不依赖 Web 服务模块
+"""
+
+import json
+from typing import Any, Dict, List
+
+# 按工具调用对象的类型缓存提取函数，同一类型只判断一次结构
+_tool_call_extractors: Dict[type, Any] = {}
+
+
+def _make_tool_call_extractor(call):
+    """根据工具调用对象的结构生成提取函数，返回 (名称, 参数)，无法识别时返回 None"""
+    if isinstance(call, dict):
+        return lambda c: (c['function'].get('name', ''), c['function'].get('arguments', {})) if 'function' in c else None
+    if hasattr(call, 'function'):
+        return lambda c: (c.function.name, c.function.arguments)
+    if hasattr(call, 'name'):
+        return lambda c: (c.name, getattr(c, 'arguments', {}))
+    return lambda c: None
+
+
+def extract_tool_call(call):
+    """提取工具调用的 (名称, 参数)"""
+    call_type = type(call)
+    extractor = _tool_call_extractors.get(call_type)
+    if extractor is None:
+        extractor = _tool_call_extractors.setdefault(call_type, _make_tool_call_extractor(call))
+    return extractor(call)
+
+
+def parse_tool_arguments(args):
+    """解析工具参数（可能是 JSON 字符串或字典），无法解析时原样返回"""
+    if isinstance(args, str):
+        try:
+            return json.loads(args)
+        except ValueError:
+            pass
+    return args
+
+
+def extract_response_tool_calls(response) -> List[Dict[str, Any]]:
+    """从非流式运行结果的 messages 中提取工具调用的名称和参数"""
+    return [
+        {'name': extracted[0], 'arguments': parse_tool_arguments(extracted[1])}
+        for msg in (getattr(response, 'messages', None) or ())
+        for call in (getattr(msg, 'tool_calls', None) or ())
+        if (extracted := extract_tool_call(call)) is not None
+    ]
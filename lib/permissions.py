@@ -8,6 +8,7 @@
 import os
 import re
 import logging
+from functools import lru_cache
 from typing import Optional, Dict, List, Any, Tuple
 from pathlib import Path
 import yaml
@@ -169,6 +170,21 @@ class PermissionChecker:
             config_path: 配置文件路径
         """
         self.config = PermissionConfig(config_path)
+        # 同一条SQL的解析结果（语句类型和表名）与用户无关，按SQL缓存
+        self._parse = lru_cache(maxsize=512)(self._parse_sql)
+    
+    def _parse_sql(self, sql: str) -> Optional[Tuple[str, Tuple[str, ...]]]:
+        """
+        解析SQL，返回 (SQL类型, 表名元组)，无法解析时返回 None
+        
+        结果只依赖SQL文本，通过 self._parse 缓存调用
+        """
+        parsed = sqlparse.parse(sql)
+        if not parsed:
+            return None
+        
+        statement = parsed[0]
+        return statement.get_type(), tuple(self._extract_tables(statement))
     
     def check_and_transform_query(
         self, 
@@ -193,18 +209,12 @@ class PermissionChecker:
         if not self.config.enabled:
             return sql, []
         
-        # 解析SQL
-        parsed = sqlparse.parse(sql)
+        parsed = self._parse(sql)
         if not parsed:
             return sql, []
         
-        statement = parsed[0]
-        
-        # 检查SQL类型
-        sql_type = statement.get_type()
-        
-        # 提取表名
-        tables = self._extract_tables(statement)
+        sql_type, tables = parsed
+        tables = list(tables)
         
         if not tables:
             return sql, []
@@ -515,7 +525,8 @@ class PermissionChecker:
         self,
         table_name: str,
         column_name: str,
-        username: str
+        username: str,
+        user_type: Optional[str] = None
     ) -> bool:
         """
         检查用户是否有权访问特定列
@@ -524,11 +535,12 @@ class PermissionChecker:
             table_name: 表名
             column_name: 列名
             username: 用户名
+            user_type: 用户类型（可选）
             
         Returns:
             是否允许访问
         """
-        perm = self.config.get_table_permissions(table_name, username)
+        perm = self.config.get_table_permissions(table_name, username, user_type)
         
         # 检查是否在禁止列表中
         forbidden_columns = perm.get("forbidden_columns", [])
@@ -5,29 +5,51 @@
 """
 
 import subprocess
+import shutil
+import stat
 import sys
 import os
 import time
 from pathlib import Path
 
+HERE = Path(__file__).resolve().parent
+FRONTEND = HERE / "frontend"
+NODE_PATH_CACHE = HERE / ".node_path_cache"
+NODE_EXECUTABLE = "node.exe" if os.name == "nt" else "node"
+
+def _load_cache():
+    """读取缓存的 Node.js 目录，缓存失效时返回 None"""
+    try:
+        cached = NODE_PATH_CACHE.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    if cached and os.path.exists(os.path.join(cached, NODE_EXECUTABLE)):
+        return cached
+    return None
+
+def _save_cache(node_dir):
+    """原子地写入 Node.js 目录缓存"""
+    tmp_path = NODE_PATH_CACHE.with_name(NODE_PATH_CACHE.name + ".tmp")
+    try:
+        tmp_path.write_text(node_dir, encoding="utf-8")
+        os.replace(tmp_path, NODE_PATH_CACHE)
+    except OSError as e:
+        print(f"ℹ️ 写入 Node.js 路径缓存失败: {e}")
+
 def find_node_installation():
     """查找系统中安装的 Node.js"""
     
-    # 方法: 使用 where 命令查找
-    try:
-        result = subprocess.run(
-            ["where", "node"], 
-            capture_output=True, 
-            text=True, 
-            shell=True,
-            timeout=10
-        )
-        if result.returncode == 0 and result.stdout.strip():
-            node_path = result.stdout.strip().split('\n')[0]
-            node_dir = os.path.dirname(node_path)
-            return node_dir
-    except Exception as e:
-        print(f"ℹ️ where 命令查找失败: {e}")
+    # 优先使用上次找到的路径，只有缓存的路径失效时才重新查找
+    cached = _load_cache()
+    if cached:
+        return cached
+    
+    # 在当前进程内按 PATH/PATHEXT 查找，无需启动 shell 和 where 子进程
+    node_path = shutil.which("node")
+    if node_path:
+        node_dir = os.path.dirname(node_path)
+        _save_cache(node_dir)
+        return node_dir
     
     return None
 
@@ -40,7 +62,7 @@ def setup_environment():
     
     if node_dir:
         # 将 Node.js 目录添加到 PATH 最前面
-        env["PATH"] = node_dir + ";" + env["PATH"]
+        env["PATH"] = node_dir + os.pathsep + env["PATH"]
     else:
         print("⚠️ 未找到 Node.js 安装，使用系统 PATH")
     
@@ -50,21 +72,35 @@ def start_dev_server(frontend_dir, env):
     """启动开发服务器"""
     print(f"\n🚀 启动前端开发服务器...")
     
+    # 直接解析出 npm 可执行文件，不经过 shell（Windows 上 npm 是 npm.cmd）
+    npm_cmd = shutil.which("npm.cmd", path=env["PATH"]) or shutil.which("npm", path=env["PATH"])
+    if not npm_cmd:
+        print("❌ 未找到 npm，请确认 Node.js 已正确安装")
+        return False
+    
     # 尝试启动开发服务器
+    process = None
     try:
         process = subprocess.Popen(
-            ["npm", "run", "dev"],
+            [npm_cmd, "run", "dev"],
             cwd=frontend_dir,
-            env=env,
-            shell=True
+            env=env
         )
-        # 等待进程结束
-        process.wait()
+        # 分段等待进程结束，Ctrl-C 能够及时打断
+        while process.poll() is None:
+            try:
+                process.wait(timeout=0.5)
+            except subprocess.TimeoutExpired:
+                pass
         
     except KeyboardInterrupt:
         print("\n🛑 用户中断，停止前端服务...")
-        if 'process' in locals():
+        if process is not None:
             process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
     except Exception as e:
         print(f"❌ 开发服务器启动失败: {e}")
         return False
@@ -74,9 +110,13 @@ def start_dev_server(frontend_dir, env):
 def start_frontend():
     """主启动函数"""
     
-    # 检查前端目录
-    frontend_dir = Path(__file__).parent / "frontend"
-    if not frontend_dir.exists():
+    # 检查前端目录（一次 stat 同时判断是否存在、是否为目录）
+    frontend_dir = FRONTEND
+    try:
+        is_dir = stat.S_ISDIR(os.stat(frontend_dir).st_mode)
+    except FileNotFoundError:
+        is_dir = False
+    if not is_dir:
         print(f"❌ 前端目录不存在: {frontend_dir}")
         print("💡 请确保 frontend/ 目录存在")
         return False
@@ -84,27 +124,21 @@ def start_frontend():
     # 设置环境
     env = setup_environment()
     
-    # 切换到前端目录
-    original_dir = os.getcwd()
+    # 启动开发服务器（子进程通过 cwd 参数在前端目录中运行，无需切换当前目录）
     try:
-        os.chdir(frontend_dir)
-        # 启动开发服务器
         return start_dev_server(frontend_dir, env)
         
     except Exception as e:
         print(f"❌ 启动过程中发生错误: {e}")
         return False
-    finally:
-        os.chdir(original_dir)
 
 def start_backend():
     """启动后端服务"""
     try:
         # 确保使用新的认证后端
         subprocess.Popen(
-            ["python", "backend/main.py"],
-            cwd=Path(__file__).parent,
-            shell=True
+            [sys.executable, "backend/main.py"],
+            cwd=HERE
         )
     except Exception as e:
         print(f"❌ 后端启动失败: {e}")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+测试共享资源
+同一解释器中的测试按创建参数复用已初始化的 Agent，避免重复创建；
+HTTP 测试复用缓存的登录 Token，避免每次运行都重新登录；
+文件检查类测试按目录一次性读取文件信息
+"""
+
+import atexit
+import base64
+import json
+import mmap
+import os
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    import orjson  # 可选依赖，存在时更快地读写 JSON
+except ImportError:
+    orjson = None
+
+# orjson 输出选项：两格缩进，允许非字符串键
+ORJSON_OPTIONS = (orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+# 与 test_jwt_auth.py 的 after-restart 流程共用同一个文件
+TOKEN_FILE = Path("test_token.txt")
+
+# 设置 ASKDB_TEST_DEBUG=1 时出错打印完整堆栈
+TEST_DEBUG = os.environ.get("ASKDB_TEST_DEBUG") == "1"
+
+
+@lru_cache(maxsize=8)
+def shared_agent(debug=False, enable_memory=False, session_id=None):
+    """
+    返回共享的 Agent，参数相同时复用同一个实例
+    
+    默认不启用会话存储，测试之间互不影响；需要独立会话时传入不同的 session_id
+    """
+    from askdb_agno import create_agent
+    
+    agent = create_agent(debug=debug, enable_memory=enable_memory, session_id=session_id)
+    atexit.register(_close_agent, agent)
+    return agent
+
+
+def _close_agent(agent):
+    """退出时关闭模型持有的 HTTP 客户端"""
+    client = getattr(getattr(agent, 'model', None), 'client', None)
+    close = getattr(client, 'close', None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
+
+
+def print_section(title, width=80, gap=True):
+    """一次写出标题块（分隔线、标题、分隔线），gap 为 True 时前面空一行"""
+    rule = "=" * width
+    prefix = "\n" if gap else ""
+    print(f"{prefix}{rule}\n{title}\n{rule}")
+
+
+def print_traceback():
+    """在 except 块中调用：调试模式打印完整堆栈，否则只打印异常类型"""
+    if TEST_DEBUG:
+        import traceback
+        traceback.print_exc()
+    else:
+        exc = sys.exc_info()[1]
+        print(f"   {type(exc).__name__}（设置 ASKDB_TEST_DEBUG=1 查看完整堆栈）")
+
+
+def _token_expiry(token):
+    """读取 JWT 载荷中的 exp（只解码，不校验签名），无法解析时返回 None"""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
+def get_token(session, base_url, username="admin", password="admin123", force=False):
+    """
+    获取登录 Token
+    
+    缓存文件中的 Token 距过期还有 60 秒以上时直接复用，否则重新登录并写回缓存。
+    
+    Returns:
+        (token, 登录响应数据)，复用缓存时登录响应数据为 None
+        
+    Raises:
+        RuntimeError: 登录失败时
+    """
+    if not force:
+        try:
+            token = TOKEN_FILE.read_text().strip()
+        except OSError:
+            token = None
+        exp = _token_expiry(token) if token else None
+        if exp is not None and exp - time.time() > 60:
+            return token, None
+    
+    response = session.post(
+        f"{base_url}/api/auth/login",
+        json={"username": username, "password": password},
+        timeout=5
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"状态码: {response.status_code}")
+    
+    data = response.json()
+    token = data.get("token")
+    if not token:
+        raise RuntimeError(data.get("message", "登录失败"))
+    
+    TOKEN_FILE.write_text(token)
+    os.chmod(TOKEN_FILE, 0o600)  # Token 等同于登录凭据，只允许当前用户读写
+    return token, data
+
+
+def snapshot_dir(root):
+    """
+    用一次 os.scandir 读取目录下的文件大小
+    
+    Returns:
+        {"<root>/<文件名>": 字节数}，目录不存在时返回空字典
+    """
+    try:
+        with os.scandir(root) as entries:
+            return {
+                f"{root}/{entry.name}": entry.stat().st_size
+                for entry in entries
+                if entry.is_file()
+            }
+    except FileNotFoundError:
+        return {}
+
+
+def file_contains(path, *needles):
+    """判断文件中是否包含任一字节串，通过 mmap 查找，无需解码整个文件"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return any(m.find(needle) != -1 for needle in needles)
+
+
+def dumps_json(obj, default=None):
+    """序列化为两格缩进、保留中文的 JSON 字符串，default 用于处理无法直接序列化的对象"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS).decode('utf-8')
+    return json.dumps(obj, indent=2, ensure_ascii=False, default=default)
+
+
+def dump_json(obj, path):
+    """把 JSON 写入文件（有 orjson 时直接写出 UTF-8 字节）"""
+    if orjson is not None:
+        Path(path).write_bytes(orjson.dumps(obj, option=ORJSON_OPTIONS))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, indent=2, ensure_ascii=False)
+
+
+def print_json(obj):
+    """把 JSON 直接写到标准输出（不先生成完整的缩进字符串）"""
+    sys.stdout.flush()
+    if orjson is not None:
+        sys.stdout.buffer.write(orjson.dumps(obj, option=ORJSON_OPTIONS))
+        sys.stdout.buffer.write(b"\n")
+        sys.stdout.buffer.flush()
+    else:
+        json.dump(obj, sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write("\n")
+
+
+def loads_json(data):
+    """解析 JSON 字符串、UTF-8 字节串或 memoryview（orjson 可直接解析，无需复制）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def load_json(path):
+    """读取 JSON 文件"""
+    return loads_json(Path(path).read_bytes())
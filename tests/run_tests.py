@@ -8,12 +8,15 @@ import os
 import sys
 import time
 import requests
-import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).parent))
 
+from _shared import dump_json, snapshot_dir
+
 print("=" * 70)
 print("🧪 AskDB v2.0 功能测试")
 print("=" * 70)
@@ -21,160 +24,207 @@ print("=" * 70)
 # 测试配置
 BACKEND_URL = "http://localhost:8000"
 TEST_RESULTS = []
+STATS = {"pass": 0, "fail": 0}  # 通过/失败计数，随 log_test 累加
 
 def log_test(test_name, passed, message=""):
     """记录测试结果"""
     status = "✅ 通过" if passed else "❌ 失败"
     TEST_RESULTS.append((test_name, passed, message))
+    STATS["pass" if passed else "fail"] += 1
     print(f"\n{status} - {test_name}")
     if message:
         print(f"   {message}")
 
-# 测试1: 检查模块导入
-print("\n" + "=" * 70)
-print("测试 1: 检查核心模块导入")
-print("=" * 70)
+# 每个目录只用 snapshot_dir 扫描一次，后续的存在性/大小检查都查缓存的字典
+_snapshot = lru_cache(maxsize=None)(snapshot_dir)
 
-try:
-    from tools.vector_store import VectorStore
-    log_test("导入 VectorStore", True, "模块导入成功")
-except Exception as e:
-    log_test("导入 VectorStore", False, f"导入失败: {str(e)[:100]}")
-
-try:
-    from tools.enhanced_tools import EnhancedDatabaseTools
-    log_test("导入 EnhancedDatabaseTools", True, "模块导入成功")
-except Exception as e:
-    log_test("导入 EnhancedDatabaseTools", False, f"导入失败: {str(e)[:100]}")
-
-try:
-    from askdb_agno import create_agent
-    log_test("导入 create_agent", True, "模块导入成功")
-except Exception as e:
-    log_test("导入 create_agent", False, f"导入失败: {str(e)[:100]}")
-
-# 测试2: 检查文件结构
-print("\n" + "=" * 70)
-print("测试 2: 检查文件结构")
-print("=" * 70)
 
-required_files = [
-    "tools/vector_store.py",
-    "tools/enhanced_tools.py",
-    "backend/main.py",
-    "askdb_agno.py",
-    "data/business_metadata.json",
-    "frontend/src/components/IndexManagement.jsx",
-    "frontend/src/components/DangerConfirmDialog.jsx",
-]
-
-for file_path in required_files:
-    exists = Path(file_path).exists()
-    log_test(f"文件存在: {file_path}", exists)
+def _file_size(file_path):
+    """返回文件大小（字节），不存在时返回 None"""
+    path = Path(file_path)
+    return _snapshot(str(path.parent)).get(f"{path.parent}/{path.name}")
 
-# 测试3: VectorStore 功能测试
-print("\n" + "=" * 70)
-print("测试 3: VectorStore 功能")
-print("=" * 70)
 
-try:
-    from tools.vector_store import VectorStore
+# 每个检查项返回 (测试名, 是否通过, 说明) 列表
+def probe_imports():
+    """测试1: 检查核心模块导入"""
+    results = []
     
-    # 创建测试实例
-    vs = VectorStore(persist_directory="data/test_vector_db")
-    log_test("VectorStore 初始化", True, "成功创建 VectorStore 实例")
+    try:
+        from tools.vector_store import VectorStore
+        results.append(("导入 VectorStore", True, "模块导入成功"))
+    except Exception as e:
+        results.append(("导入 VectorStore", False, f"导入失败: {str(e)[:100]}"))
     
-    # 测试索引统计
-    stats = vs.get_index_stats()
-    log_test("获取索引统计", True, 
-             f"表: {stats['tables']}, 列: {stats['columns']}, 术语: {stats['business_terms']}")
+    try:
+        from tools.enhanced_tools import EnhancedDatabaseTools
+        results.append(("导入 EnhancedDatabaseTools", True, "模块导入成功"))
+    except Exception as e:
+        results.append(("导入 EnhancedDatabaseTools", False, f"导入失败: {str(e)[:100]}"))
     
-    # 测试业务术语索引
-    if Path("data/business_metadata.json").exists():
-        count = vs.index_business_terms("data/business_metadata.json")
-        log_test("索引业务术语", count >= 0, f"索引了 {count} 个业务术语")
+    try:
+        from askdb_agno import create_agent
+        results.append(("导入 create_agent", True, "模块导入成功"))
+    except Exception as e:
+        results.append(("导入 create_agent", False, f"导入失败: {str(e)[:100]}"))
+    
+    return results
+
+
+def probe_required_files():
+    """测试2: 检查文件结构"""
+    required_files = [
+        "tools/vector_store.py",
+        "tools/enhanced_tools.py",
+        "backend/main.py",
+        "askdb_agno.py",
+        "data/business_metadata.json",
+        "frontend/src/components/IndexManagement.jsx",
+        "frontend/src/components/DangerConfirmDialog.jsx",
+    ]
+    
+    return [
+        (f"文件存在: {file_path}", _file_size(file_path) is not None, "")
+        for file_path in required_files
+    ]
+
+
+def probe_vector_store():
+    """测试3: VectorStore 功能测试"""
+    results = []
+    
+    try:
+        from tools.vector_store import VectorStore
+        
+        # 创建测试实例
+        vs = VectorStore(persist_directory="data/test_vector_db")
+        results.append(("VectorStore 初始化", True, "成功创建 VectorStore 实例"))
         
-        # 测试搜索
-        results = vs.search("用户活跃度", top_k=3, search_types=["business_term"])
-        log_test("语义搜索", len(results) >= 0, f"找到 {len(results)} 个相关结果")
-    else:
-        log_test("业务术语文件", False, "business_metadata.json 不存在")
+        # 测试索引统计
+        stats = vs.get_index_stats()
+        results.append(("获取索引统计", True,
+                        f"表: {stats['tables']}, 列: {stats['columns']}, 术语: {stats['business_terms']}"))
         
-except Exception as e:
-    log_test("VectorStore 测试", False, f"测试失败: {str(e)[:100]}")
+        # 测试业务术语索引
+        if _file_size("data/business_metadata.json") is not None:
+            count = vs.index_business_terms("data/business_metadata.json")
+            results.append(("索引业务术语", count >= 0, f"索引了 {count} 个业务术语"))
+            
+            # 测试搜索
+            search_results = vs.search("用户活跃度", top_k=3, search_types=["business_term"])
+            results.append(("语义搜索", len(search_results) >= 0, f"找到 {len(search_results)} 个相关结果"))
+        else:
+            results.append(("业务术语文件", False, "business_metadata.json 不存在"))
+            
+    except Exception as e:
+        results.append(("VectorStore 测试", False, f"测试失败: {str(e)[:100]}"))
+    
+    return results
 
-# 测试4: 后端 API 测试（如果后端在运行）
-print("\n" + "=" * 70)
-print("测试 4: 后端 API 连接测试")
-print("=" * 70)
 
-try:
-    response = requests.get(f"{BACKEND_URL}/api/public/health", timeout=3)
-    if response.status_code == 200:
-        data = response.json()
-        log_test("后端健康检查", True, 
-                f"服务: {data.get('service')}, 版本: {data.get('version')}")
-        
-        # 测试索引状态 API（需要登录，但我们可以测试端点是否存在）
-        log_test("后端服务运行", True, "后端在 http://localhost:8000 运行")
-    else:
-        log_test("后端健康检查", False, f"状态码: {response.status_code}")
-except requests.exceptions.ConnectionError:
-    log_test("后端连接", False, "后端服务未运行。启动方式: python start_backend.py")
-except Exception as e:
-    log_test("后端测试", False, f"错误: {str(e)[:100]}")
-
-# 测试5: 前端文件检查
-print("\n" + "=" * 70)
-print("测试 5: 前端组件检查")
-print("=" * 70)
+def probe_backend():
+    """测试4: 后端 API 测试（如果后端在运行）"""
+    results = []
+    
+    try:
+        response = HTTP_SESSION.get(f"{BACKEND_URL}/api/public/health", timeout=3)
+        if response.status_code == 200:
+            data = response.json()
+            results.append(("后端健康检查", True,
+                            f"服务: {data.get('service')}, 版本: {data.get('version')}"))
+            
+            # 测试索引状态 API（需要登录，但我们可以测试端点是否存在）
+            results.append(("后端服务运行", True, "后端在 http://localhost:8000 运行"))
+        else:
+            results.append(("后端健康检查", False, f"状态码: {response.status_code}"))
+    except requests.exceptions.ConnectionError:
+        results.append(("后端连接", False, "后端服务未运行。启动方式: python start_backend.py"))
+    except Exception as e:
+        results.append(("后端测试", False, f"错误: {str(e)[:100]}"))
+    
+    return results
+
+
+def probe_frontend_files():
+    """测试5: 前端文件检查"""
+    frontend_files = {
+        "frontend/package.json": "前端依赖配置",
+        "frontend/src/App.jsx": "主应用组件",
+        "frontend/src/components/IndexManagement.jsx": "索引管理组件",
+        "frontend/src/components/DangerConfirmDialog.jsx": "危险操作确认对话框",
+        "frontend/src/components/ChatSidebar.jsx": "聊天侧边栏",
+    }
+    
+    results = []
+    for file_path, description in frontend_files.items():
+        size = _file_size(file_path)
+        if size is not None:
+            results.append((f"{description}", True, f"{file_path} ({size} 字节)"))
+        else:
+            results.append((f"{description}", False, f"{file_path} 不存在"))
+    
+    return results
+
+
+def probe_docs():
+    """测试6: 文档完整性"""
+    docs = [
+        "QUICK_START.md",
+        "DEPLOYMENT_GUIDE.md",
+        "PROJECT_DELIVERY.md",
+        "RELEASE_v2.0.md",
+        "DELIVERY_CHECKLIST.md",
+    ]
+    
+    results = []
+    for doc in docs:
+        if _file_size(doc) is not None:
+            with open(doc, 'r', encoding='utf-8') as f:
+                lines = len(f.readlines())
+            results.append((f"文档: {doc}", True, f"{lines} 行"))
+        else:
+            results.append((f"文档: {doc}", False, "文件不存在"))
+    
+    return results
 
-frontend_files = {
-    "frontend/package.json": "前端依赖配置",
-    "frontend/src/App.jsx": "主应用组件",
-    "frontend/src/components/IndexManagement.jsx": "索引管理组件",
-    "frontend/src/components/DangerConfirmDialog.jsx": "危险操作确认对话框",
-    "frontend/src/components/ChatSidebar.jsx": "聊天侧边栏",
-}
-
-for file_path, description in frontend_files.items():
-    exists = Path(file_path).exists()
-    if exists:
-        size = Path(file_path).stat().st_size
-        log_test(f"{description}", True, f"{file_path} ({size} 字节)")
-    else:
-        log_test(f"{description}", False, f"{file_path} 不存在")
-
-# 测试6: 文档完整性
-print("\n" + "=" * 70)
-print("测试 6: 文档完整性")
-print("=" * 70)
 
-docs = [
-    "QUICK_START.md",
-    "DEPLOYMENT_GUIDE.md",
-    "PROJECT_DELIVERY.md",
-    "RELEASE_v2.0.md",
-    "DELIVERY_CHECKLIST.md",
+PROBES = [
+    ("测试 1: 检查核心模块导入", probe_imports),
+    ("测试 2: 检查文件结构", probe_required_files),
+    ("测试 3: VectorStore 功能", probe_vector_store),
+    ("测试 4: 后端 API 连接测试", probe_backend),
+    ("测试 5: 前端组件检查", probe_frontend_files),
+    ("测试 6: 文档完整性", probe_docs),
 ]
 
-for doc in docs:
-    exists = Path(doc).exists()
-    if exists:
-        with open(doc, 'r', encoding='utf-8') as f:
-            lines = len(f.readlines())
-        log_test(f"文档: {doc}", True, f"{lines} 行")
-    else:
-        log_test(f"文档: {doc}", False, "文件不存在")
+# 只做文件系统和网络 I/O 的检查，可以在后台线程中与其他检查同时执行
+IO_PROBES = (probe_required_files, probe_backend, probe_frontend_files, probe_docs)
+
+HTTP_SESSION = requests.Session()
+
+# I/O 检查先提交到线程池；导入和 VectorStore 检查会加载大型模块（并发导入同一模块不安全），
+# 留在主线程按顺序执行。结果按 PROBES 的顺序输出
+with ThreadPoolExecutor(max_workers=len(IO_PROBES)) as executor:
+    futures = {probe: executor.submit(probe) for probe in IO_PROBES}
+    
+    for title, probe in PROBES:
+        print("\n" + "=" * 70)
+        print(title)
+        print("=" * 70)
+        
+        results = futures[probe].result() if probe in futures else probe()
+        for test_name, passed, message in results:
+            log_test(test_name, passed, message)
+
+HTTP_SESSION.close()
 
 # 测试总结
 print("\n" + "=" * 70)
 print("📊 测试总结")
 print("=" * 70)
 
-passed = sum(1 for _, p, _ in TEST_RESULTS if p)
-failed = sum(1 for _, p, _ in TEST_RESULTS if not p)
-total = len(TEST_RESULTS)
+passed, failed = STATS["pass"], STATS["fail"]
+total = passed + failed
 
 print(f"\n总测试数: {total}")
 print(f"✅ 通过: {passed}")
@@ -183,8 +233,8 @@ print(f"通过率: {passed/total*100:.1f}%")
 
 if failed > 0:
     print("\n失败的测试:")
-    for name, passed, message in TEST_RESULTS:
-        if not passed:
+    for name, passed_test, message in TEST_RESULTS:
+        if not passed_test:
             print(f"  ❌ {name}")
             if message:
                 print(f"     {message}")
@@ -222,18 +272,17 @@ print("=" * 70)
 
 # 保存测试报告
 report_path = "test_results.json"
-with open(report_path, 'w', encoding='utf-8') as f:
-    json.dump({
-        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "total": total,
-        "passed": passed,
-        "failed": failed,
-        "pass_rate": f"{passed/total*100:.1f}%",
-        "results": [
-            {"test": name, "passed": p, "message": msg}
-            for name, p, msg in TEST_RESULTS
-        ]
-    }, f, indent=2, ensure_ascii=False)
+dump_json({
+    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    "total": total,
+    "passed": passed,
+    "failed": failed,
+    "pass_rate": f"{passed/total*100:.1f}%",
+    "results": [
+        {"test": name, "passed": p, "message": msg}
+        for name, p, msg in TEST_RESULTS
+    ]
+}, report_path)
 
 print(f"\n📄 测试报告已保存: {report_path}")
 
@@ -15,7 +15,34 @@ load_dotenv()
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-from askdb_agno import create_agent
+from _shared import print_traceback, shared_agent
+
+def _fmt_scalar(value):
+    print(f"  值: {value}")
+
+def _fmt_list(value):
+    print(f"  长度/键数: {len(value)}")
+    if len(value) < 10:
+        print(f"  前几项: {value[:3]}")
+
+def _fmt_dict(value):
+    print(f"  长度/键数: {len(value)}")
+    if len(value) < 10:
+        print(f"  内容: {value}")
+
+def _fmt_repr(value):
+    print(f"  值: {str(value)[:200]}")
+
+# 按值的类型选择输出方式，其余类型截断显示
+FORMATTERS = {
+    str: _fmt_scalar,
+    int: _fmt_scalar,
+    float: _fmt_scalar,
+    bool: _fmt_scalar,
+    type(None): _fmt_scalar,
+    list: _fmt_list,
+    dict: _fmt_dict,
+}
 
 def inspect_response(response):
     """检查 response 对象的所有属性"""
@@ -23,8 +50,10 @@ def inspect_response(response):
     print("Response 对象属性检查")
     print("=" * 60)
     
+    attr_names = dir(response)
+    attrs = set(attr_names)
     print(f"\n类型: {type(response)}")
-    print(f"\n所有属性: {dir(response)}")
+    print(f"\n所有属性: {attr_names}")
     
     print("\n" + "-" * 60)
     print("主要属性值:")
@@ -39,23 +68,14 @@ def inspect_response(response):
     ]
     
     for attr in common_attrs:
-        if hasattr(response, attr):
+        if attr in attrs:
             value = getattr(response, attr)
             print(f"\n{attr}:")
             print(f"  类型: {type(value)}")
-            if isinstance(value, (str, int, float, bool, type(None))):
-                print(f"  值: {value}")
-            elif isinstance(value, (list, dict)):
-                print(f"  长度/键数: {len(value)}")
-                if isinstance(value, dict) and len(value) < 10:
-                    print(f"  内容: {value}")
-                elif isinstance(value, list) and len(value) < 10:
-                    print(f"  前几项: {value[:3]}")
-            else:
-                print(f"  值: {str(value)[:200]}")
+            FORMATTERS.get(type(value), _fmt_repr)(value)
     
     # 检查 content 属性
-    if hasattr(response, 'content'):
+    if 'content' in attrs:
         print(f"\ncontent 内容预览:")
         print(f"  {str(response.content)[:500]}...")
     
@@ -76,7 +96,7 @@ def inspect_response(response):
 def main():
     print("创建 Agent...")
     try:
-        agent = create_agent(debug=False, enable_memory=False)
+        agent = shared_agent()
         print("✓ Agent 创建成功\n")
         
         # 测试一个简单查询
@@ -93,14 +113,16 @@ def main():
         print("\n" + "=" * 60)
         print("Agent 对象相关方法:")
         print("=" * 60)
-        agent_methods = [m for m in dir(agent) if 'tool' in m.lower() or 'run' in m.lower() or 'history' in m.lower()]
+        agent_methods = [
+            m for m, ml in ((m, m.lower()) for m in dir(agent))
+            if 'tool' in ml or 'run' in ml or 'history' in ml
+        ]
         for method in agent_methods:
             print(f"  - {method}")
         
     except Exception as e:
         print(f"错误: {e}")
-        import traceback
-        traceback.print_exc()
+        print_traceback()
 
 if __name__ == "__main__":
     main()
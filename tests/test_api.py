@@ -2,10 +2,14 @@
 """测试历史消息API是否正常工作"""
 
 import requests
-import json
+
+from _shared import print_json, print_traceback
 
 API_BASE = "http://localhost:8000/api"
 
+# 复用同一个会话，所有请求共享 keep-alive 连接和认证头
+session = requests.Session()
+
 def test_history_api():
     print("=" * 80)
     print("测试会话历史API")
@@ -13,7 +17,7 @@ def test_history_api():
     
     # 1. 先登录获取token
     print("\n1. 尝试登录...")
-    login_response = requests.post(f"{API_BASE}/auth/login", json={
+    login_response = session.post(f"{API_BASE}/auth/login", json={
         "username": "test_user",
         "password": "123456"
     })
@@ -25,7 +29,7 @@ def test_history_api():
         print(f"❌ 登录失败: {login_response.status_code}")
         print(f"   尝试使用其他用户...")
         # 尝试perf_test_user
-        login_response = requests.post(f"{API_BASE}/auth/login", json={
+        login_response = session.post(f"{API_BASE}/auth/login", json={
             "username": "perf_test_user",
             "password": "123456"
         })
@@ -43,8 +47,8 @@ def test_history_api():
     
     # 2. 获取会话列表
     print("\n2. 获取会话列表...")
-    headers = {"Authorization": f"Bearer {token}"}
-    sessions_response = requests.get(f"{API_BASE}/protected/sessions", headers=headers)
+    session.headers["Authorization"] = f"Bearer {token}"
+    sessions_response = session.get(f"{API_BASE}/protected/sessions")
     
     if not sessions_response.ok:
         print(f"❌ 获取会话列表失败: {sessions_response.status_code}")
@@ -59,9 +63,9 @@ def test_history_api():
     
     # 3. 找一个有消息的会话
     target_session = None
-    for session in sessions:
-        if session['message_count'] > 0:
-            target_session = session
+    for item in sessions:
+        if item['message_count'] > 0:
+            target_session = item
             break
     
     if not target_session:
@@ -74,9 +78,8 @@ def test_history_api():
     
     # 4. 获取历史消息
     print(f"\n4. 获取历史消息...")
-    history_response = requests.get(
-        f"{API_BASE}/protected/sessions/{target_session['id']}/history",
-        headers=headers
+    history_response = session.get(
+        f"{API_BASE}/protected/sessions/{target_session['id']}/history"
     )
     
     print(f"   状态码: {history_response.status_code}")
@@ -108,15 +111,15 @@ def test_history_api():
     
     # 5. 完整响应
     print(f"\n完整JSON响应:")
-    print(json.dumps(history_data, indent=2, ensure_ascii=False))
+    print_json(history_data)
 
 if __name__ == "__main__":
     try:
-        test_history_api()
+        with session:
+            test_history_api()
     except requests.exceptions.ConnectionError:
         print("❌ 无法连接到后端服务，请确保后端正在运行: uv run python backend/main.py")
     except Exception as e:
         print(f"❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        print_traceback()
 
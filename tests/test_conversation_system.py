@@ -3,19 +3,65 @@
 测试重构后的对话存储系统
 """
 
+import csv
+import os
+import sqlite3
+import subprocess
 import sys
+import threading
 import time
+from functools import lru_cache
 from pathlib import Path
 
+import pytest
+
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from backend.conversation_db import conversation_db
+from backend.conversation_db import ACTIVE_USER_CONVERSATIONS_SQL, conversation_db
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 性能测试各阶段的耗时上限（秒），超出即视为性能回退
+# 较慢的机器或 CI 上可通过 ASKDB_PERF_BUDGET_SCALE 按比例放宽
+BUDGETS = {
+    "create_100": 2.0,
+    "query_sessions": 0.2,
+    "query_messages": 0.2,
+}
+BUDGET_SCALE = float(os.environ.get("ASKDB_PERF_BUDGET_SCALE", "1"))
+
+# 设置 ASKDB_PERF_HISTORY 为 CSV 路径时记录每次运行的耗时，便于跟踪性能变化
+PERF_HISTORY = os.environ.get("ASKDB_PERF_HISTORY")
+
+
+@lru_cache(maxsize=None)
+def _git_sha() -> str:
+    """当前提交的 SHA，不在 git 仓库中时返回 unknown"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def check_budget(phase: str, elapsed: float):
+    """按需记录阶段耗时到 CSV，并断言未超出预算"""
+    if PERF_HISTORY:
+        path = Path(PERF_HISTORY)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow([_git_sha(), f"{time.time():.0f}", phase, f"{elapsed:.6f}"])
+    
+    budget = BUDGETS[phase] * BUDGET_SCALE
+    assert elapsed < budget, f"性能回退: {phase} 耗时 {elapsed:.3f}s，预算 {budget}s"
+
 
 def test_conversation_system():
     """测试对话系统的完整流程"""
@@ -43,35 +89,37 @@ def test_conversation_system():
     # 2. 测试添加消息
     print("\n2️⃣  测试添加消息...")
     
-    # 添加用户消息
-    msg1 = conversation_db.add_message(
-        conversation_id=session_id,
-        role='user',
-        content='查询销售数据'
-    )
-    print(f"✅ 添加用户消息: {msg1['content'][:30]}...")
-    
-    # 添加AI响应
-    msg2 = conversation_db.add_message(
-        conversation_id=session_id,
-        role='assistant',
-        content='好的，我来帮你查询销售数据。请问你需要查询哪个时间段的数据？'
-    )
-    print(f"✅ 添加AI响应: {msg2['content'][:30]}...")
-    
-    # 添加更多消息
-    msg3 = conversation_db.add_message(
-        conversation_id=session_id,
-        role='user',
-        content='查询最近30天的销售总额'
-    )
-    
-    msg4 = conversation_db.add_message(
-        conversation_id=session_id,
-        role='assistant',
-        content='根据查询结果，最近30天的销售总额为 ¥1,234,567.89'
-    )
-    
+    # 4 条消息在同一个事务中写入，只提交一次
+    with conversation_db.transaction():
+        # 添加用户消息
+        msg1 = conversation_db.add_message(
+            conversation_id=session_id,
+            role='user',
+            content='查询销售数据'
+        )
+        print(f"✅ 添加用户消息: {msg1['content'][:30]}...")
+        
+        # 添加AI响应
+        msg2 = conversation_db.add_message(
+            conversation_id=session_id,
+            role='assistant',
+            content='好的，我来帮你查询销售数据。请问你需要查询哪个时间段的数据？'
+        )
+        print(f"✅ 添加AI响应: {msg2['content'][:30]}...")
+        
+        # 添加更多消息
+        msg3 = conversation_db.add_message(
+            conversation_id=session_id,
+            role='user',
+            content='查询最近30天的销售总额'
+        )
+        
+        msg4 = conversation_db.add_message(
+            conversation_id=session_id,
+            role='assistant',
+            content='根据查询结果，最近30天的销售总额为 ¥1,234,567.89'
+        )
+        
     print(f"✅ 共添加 4 条消息")
     
     # 3. 测试获取会话历史
@@ -211,6 +259,71 @@ def test_error_handling():
     print("=" * 60)
 
 
+def test_transaction():
+    """测试外层事务：块内的读写不应提前提交或回滚"""
+    print("\n" + "=" * 60)
+    print("测试外层事务")
+    print("=" * 60)
+    
+    session_id = f"test_user_{int(time.time() * 1000)}_tx"
+    conversation_db.create_conversation(
+        conversation_id=session_id,
+        user_id=1,
+        username="test_user",
+        title="事务测试"
+    )
+    
+    # 1. 块内的读操作不应回滚此前写入的消息
+    print("\n1️⃣  测试事务中穿插读操作...")
+    with conversation_db.transaction():
+        conversation_db.add_message(conversation_id=session_id, role='user', content='第一条')
+        conversation_db.get_conversation(session_id)
+        conversation_db.add_message(conversation_id=session_id, role='assistant', content='第二条')
+    
+    messages = conversation_db.get_conversation_messages(session_id)
+    assert [m['content'] for m in messages] == ['第一条', '第二条']
+    print("✅ 两条消息均已提交")
+    
+    # 2. 块内抛出异常时，各方法自己的 commit 不应让部分写入生效
+    print("\n2️⃣  测试事务中抛出异常...")
+    try:
+        with conversation_db.transaction():
+            conversation_db.update_conversation_title(session_id, "不应生效")
+            conversation_db.add_message(conversation_id=session_id, role='user', content='第三条')
+            raise RuntimeError("中途失败")
+    except RuntimeError:
+        pass
+    
+    assert conversation_db.get_conversation(session_id)['title'] == "事务测试"
+    assert len(conversation_db.get_conversation_messages(session_id)) == 2
+    print("✅ 标题和消息均已回滚")
+    
+    conversation_db.delete_conversation(session_id)
+
+
+def test_thread_connection_closed():
+    """测试线程连接：线程结束或显式释放时真正关闭"""
+    print("\n" + "=" * 60)
+    print("测试线程连接的释放")
+    print("=" * 60)
+    
+    connections = []
+    worker = threading.Thread(target=lambda: connections.append(conversation_db.get_connection()))
+    worker.start()
+    worker.join()
+    
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[0].execute("SELECT 1")
+    print("✅ 线程结束后连接已关闭")
+    
+    conn = conversation_db.get_connection()
+    conversation_db.close_thread_connection()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert conversation_db.get_connection() is not conn
+    print("✅ close_thread_connection 释放后重新创建连接")
+
+
 def test_performance():
     """测试性能"""
     print("\n" + "=" * 60)
@@ -221,44 +334,59 @@ def test_performance():
     
     # 1. 测试批量创建会话
     print("\n1️⃣  测试批量创建 100 个会话...")
-    start_time = time.time()
-    
-    for i in range(100):
-        session_id = f"{test_username}_{int(time.time() * 1000000) + i}"
-        conversation_db.create_conversation(
-            conversation_id=session_id,
-            user_id=999,
-            username=test_username,
-            title=f"性能测试会话 {i}"
-        )
-        # 每个会话添加 5 条消息
-        for j in range(5):
-            conversation_db.add_message(
-                session_id,
-                'user' if j % 2 == 0 else 'assistant',
-                f"测试消息 {j}"
-            )
-    
-    elapsed = time.time() - start_time
+    start_time = time.perf_counter()
+    
+    base_id = int(time.time() * 1000000)
+    rows = [
+        (f"{test_username}_{base_id + i}", 999, test_username, f"性能测试会话 {i}")
+        for i in range(100)
+    ]
+    # 每个会话添加 5 条消息
+    msg_rows = [
+        (session_id, 'user' if j % 2 == 0 else 'assistant', f"测试消息 {j}")
+        for session_id, *_ in rows
+        for j in range(5)
+    ]
+    created = conversation_db.bulk_create(rows, msg_rows)
+    assert created == 100, "批量创建的会话数量不正确"
+    
+    elapsed = time.perf_counter() - start_time
     print(f"✅ 创建 100 个会话（每个5条消息）耗时: {elapsed:.2f}秒")
     print(f"   平均每个会话: {elapsed/100*1000:.2f}ms")
+    check_budget("create_100", elapsed)
     
     # 2. 测试查询性能
     print("\n2️⃣  测试查询性能...")
-    start_time = time.time()
+    start_time = time.perf_counter()
     sessions = conversation_db.get_user_conversations(test_username, limit=100)
-    elapsed = time.time() - start_time
+    elapsed = time.perf_counter() - start_time
     print(f"✅ 查询 {len(sessions)} 个会话耗时: {elapsed*1000:.2f}ms")
+    check_budget("query_sessions", elapsed)
+    
+    # 会话列表查询应走 (username, is_active, updated_at DESC) 复合索引，且无需额外排序
+    conn = conversation_db.get_connection()
+    try:
+        plan = " ".join(
+            row['detail']
+            for row in conn.execute("EXPLAIN QUERY PLAN " + ACTIVE_USER_CONVERSATIONS_SQL, (test_username, 100))
+        )
+    finally:
+        conn.close()
+    print(f"   查询计划: {plan}")
+    assert "USING INDEX idx_conversations_user" in plan, f"会话列表查询未使用索引: {plan}"
+    assert "TEMP B-TREE" not in plan, f"会话列表查询需要额外排序: {plan}"
     
     # 3. 测试消息查询性能
     print("\n3️⃣  测试消息查询性能...")
     if sessions:
-        start_time = time.time()
-        for session in sessions[:10]:
-            messages = conversation_db.get_conversation_messages(session['id'])
-        elapsed = time.time() - start_time
+        start_time = time.perf_counter()
+        ids = [s['id'] for s in sessions[:10]]
+        messages_by_session = conversation_db.get_messages_for_conversations(ids)
+        elapsed = time.perf_counter() - start_time
+        assert set(messages_by_session) == set(ids), "批量查询消息返回的会话不完整"
         print(f"✅ 查询 10 个会话的消息耗时: {elapsed*1000:.2f}ms")
         print(f"   平均每个会话: {elapsed/10*1000:.2f}ms")
+        check_budget("query_messages", elapsed)
     
     print("\n" + "=" * 60)
     print("✅ 性能测试完成！")
@@ -273,6 +401,12 @@ if __name__ == "__main__":
         # 运行错误处理测试
         test_error_handling()
         
+        # 运行外层事务测试
+        test_transaction()
+        
+        # 运行线程连接释放测试
+        test_thread_connection_closed()
+        
         # 运行性能测试
         test_performance()
         
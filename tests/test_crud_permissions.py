@@ -12,6 +12,7 @@ project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 from lib.permissions import PermissionChecker, PermissionDeniedException
+from _shared import print_traceback
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
@@ -301,6 +302,5 @@ if __name__ == "__main__":
         console.print("\n[yellow]测试已取消[/yellow]")
     except Exception as e:
         console.print(f"\n[red]错误: {e}[/red]")
-        import traceback
-        traceback.print_exc()
+        print_traceback()
 
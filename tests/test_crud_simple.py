@@ -12,6 +12,7 @@ project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 from lib.permissions import PermissionChecker, PermissionDeniedException
+from _shared import print_traceback
 
 
 def test_crud_permissions():
@@ -54,35 +55,40 @@ def test_crud_permissions():
     failed = 0
     
     for username, sql, should_allow, desc in test_cases:
-        print(f"\n{'-'*80}")
-        print(f"测试: {desc}")
-        print(f"用户: {username}")
-        print(f"SQL: {sql}")
-        print(f"预期: {'允许' if should_allow else '拒绝'}")
+        # 每个用例拼成一段文本，一次写出
+        header = (
+            f"\n{'-'*80}\n"
+            f"测试: {desc}\n"
+            f"用户: {username}\n"
+            f"SQL: {sql}\n"
+            f"预期: {'允许' if should_allow else '拒绝'}\n"
+        )
         
         try:
             transformed_sql, warnings = checker.check_and_transform_query(sql, username)
             
             # 操作被允许
             if should_allow:
-                print(f"结果: [通过] 操作被允许")
+                result = "结果: [通过] 操作被允许\n"
                 if transformed_sql != sql:
-                    print(f"转换: {transformed_sql}")
+                    result += f"转换: {transformed_sql}\n"
                 passed += 1
             else:
-                print(f"结果: [失败] 操作被允许（应该拒绝）")
+                result = "结果: [失败] 操作被允许（应该拒绝）\n"
                 failed += 1
                 
         except PermissionDeniedException as e:
             # 操作被拒绝
             if not should_allow:
-                print(f"结果: [通过] 操作被拒绝")
-                print(f"原因: {e}")
+                result = f"结果: [通过] 操作被拒绝\n原因: {e}\n"
                 passed += 1
             else:
-                print(f"结果: [失败] 操作被拒绝（应该允许）")
-                print(f"原因: {e}")
+                result = f"结果: [失败] 操作被拒绝（应该允许）\n原因: {e}\n"
                 failed += 1
+        
+        sys.stdout.write(header + result)
+    
+    sys.stdout.flush()
     
     # 总结
     print("\n" + "="*80)
@@ -106,7 +112,6 @@ if __name__ == "__main__":
         sys.exit(1)
     except Exception as e:
         print(f"\n错误: {e}")
-        import traceback
-        traceback.print_exc()
+        print_traceback()
         sys.exit(1)
 
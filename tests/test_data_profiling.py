@@ -12,7 +12,7 @@ from pathlib import Path
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-from askdb_agno import create_agent
+from _shared import print_traceback, shared_agent
 from tools.agno_tools import db
 
 def test_data_profiling():
@@ -35,7 +35,7 @@ def test_data_profiling():
     
     # 创建 Agent
     print("\n2️⃣ 创建 AI Agent...")
-    agent = create_agent(debug=False, enable_memory=False)
+    agent = shared_agent()
     print("   ✅ Agent 创建成功")
     
     # 测试用例
@@ -56,6 +56,9 @@ def test_data_profiling():
             "expected": ["平均", "质量", "空值", "AVG"]
         }
     ]
+    # 关键词只需转换一次小写
+    for test_case in test_queries:
+        test_case['expected_lc'] = [kw.lower() for kw in test_case['expected']]
     
     print("\n3️⃣ 执行测试查询...")
     
@@ -74,8 +77,11 @@ def test_data_profiling():
             print(answer)
             
             # 检查是否包含数据质量相关内容
-            quality_keywords = test_case['expected']
-            found_keywords = [kw for kw in quality_keywords if kw.lower() in answer.lower()]
+            answer_lower = answer.lower()
+            found_keywords = [
+                kw for kw, kw_lower in zip(test_case['expected'], test_case['expected_lc'])
+                if kw_lower in answer_lower
+            ]
             
             if found_keywords:
                 print(f"\n✅ 检测到数据质量评估相关内容: {', '.join(found_keywords)}")
@@ -84,8 +90,7 @@ def test_data_profiling():
             
         except Exception as e:
             print(f"❌ 查询失败: {e}")
-            import traceback
-            traceback.print_exc()
+            print_traceback()
     
     print("\n" + "=" * 70)
     print("✅ 测试完成")
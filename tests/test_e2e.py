@@ -7,10 +7,13 @@
 
 import os
 import sys
-import json
 import time
 import requests
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from _shared import get_token, snapshot_dir, dump_json
 
 # 设置编码
 if sys.platform == 'win32':
@@ -24,27 +27,52 @@ print("=" * 70)
 BACKEND_URL = "http://localhost:8000"
 FRONTEND_URL = "http://localhost:5173"
 TEST_RESULTS = []
+STATS = {"pass": 0, "fail": 0}  # 通过/失败计数，随 log_test 累加
+
+# 所有请求共用一个会话，keep-alive 复用到 localhost 的连接
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=1, backoff_factor=0.1)
+))
+
+# 相互独立的请求并发发出，总耗时约等于最慢的一个请求
+HTTP_POOL = ThreadPoolExecutor(max_workers=8)
+
+def run_concurrently(*calls):
+    """并发执行多个无参调用，按传入顺序返回结果，异常作为结果返回"""
+    futures = [HTTP_POOL.submit(call) for call in calls]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
 
 def log_test(test_name, passed, message=""):
     """记录测试结果"""
     status = "✅ 通过" if passed else "❌ 失败"
     TEST_RESULTS.append((test_name, passed, message))
+    STATS["pass" if passed else "fail"] += 1
     print(f"\n{status} - {test_name}")
     if message:
         print(f"   {message}")
 
-def wait_for_service(url, name, max_retries=3, delay=2):
-    """等待服务启动"""
+def wait_for_service(url, name, max_retries=5, delay=0.05):
+    """等待服务启动：HEAD 探测（连接超时 0.2 秒），失败后指数退避重试"""
     for i in range(max_retries):
         try:
-            response = requests.get(url, timeout=5)
+            response = SESSION.head(url, timeout=(0.2, 1.0), allow_redirects=False)
             if response.status_code < 500:
                 return True
-        except:
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             pass
         if i < max_retries - 1:
             print(f"   等待{name}启动... ({i+1}/{max_retries})")
             time.sleep(delay)
+            delay = min(delay * 2, 1.0)
     return False
 
 # 测试1: 服务可用性检查
@@ -52,9 +80,22 @@ print("\n" + "=" * 70)
 print("测试 1: 服务可用性检查")
 print("=" * 70)
 
+# 服务可能刚启动，先等待两者就绪（超时后照常检查，由下面的用例报告失败）
+run_concurrently(
+    lambda: wait_for_service(f"{BACKEND_URL}/api/public/health", "后端服务"),
+    lambda: wait_for_service(FRONTEND_URL, "前端服务"),
+)
+
+backend_response, frontend_response = run_concurrently(
+    lambda: SESSION.get(f"{BACKEND_URL}/api/public/health", timeout=5),
+    lambda: SESSION.get(FRONTEND_URL, timeout=5),
+)
+
 backend_available = False
 try:
-    response = requests.get(f"{BACKEND_URL}/api/public/health", timeout=5)
+    response = backend_response
+    if isinstance(response, Exception):
+        raise response
     backend_available = response.status_code == 200
     if backend_available:
         data = response.json()
@@ -67,7 +108,9 @@ except Exception as e:
 
 frontend_available = False
 try:
-    response = requests.get(FRONTEND_URL, timeout=5)
+    response = frontend_response
+    if isinstance(response, Exception):
+        raise response
     frontend_available = response.status_code < 500
     if frontend_available:
         log_test("前端服务可用", True, "前端服务响应正常")
@@ -81,40 +124,25 @@ print("\n" + "=" * 70)
 print("测试 2: 用户认证流程")
 print("=" * 70)
 
-token = None
+login_token = None
 if backend_available:
-    # 登录测试
+    # 登录测试：始终真正调用登录接口，得到的 Token 写入缓存文件
     try:
-        login_data = {
-            "username": "admin",
-            "password": "admin123"
-        }
-        response = requests.post(
-            f"{BACKEND_URL}/api/auth/login",
-            json=login_data,
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("success") and data.get("token"):
-                token = data["token"]
-                user = data.get("user", {})
-                log_test("管理员登录", True, 
-                        f"用户: {user.get('username')}, 类型: {user.get('user_type')}")
-            else:
-                log_test("管理员登录", False, data.get("message", "登录失败"))
-        else:
-            log_test("管理员登录", False, f"状态码: {response.status_code}")
+        login_token, data = get_token(SESSION, BACKEND_URL, "admin", "admin123", force=True)
+        user = data.get("user", {})
+        log_test("管理员登录", user.get("username") == "admin", 
+                f"用户: {user.get('username')}, 类型: {user.get('user_type')}")
+    except RuntimeError as e:
+        log_test("管理员登录", False, str(e))
     except Exception as e:
         log_test("管理员登录", False, f"错误: {str(e)[:50]}")
     
     # Token验证测试
-    if token:
+    if login_token:
         try:
-            response = requests.post(
+            response = SESSION.post(
                 f"{BACKEND_URL}/api/auth/verify",
-                json={"token": token},
+                json={"token": login_token},
                 timeout=5
             )
             
@@ -131,84 +159,58 @@ if backend_available:
 else:
     log_test("用户认证流程", False, "后端服务不可用，跳过测试")
 
+# 之后的受保护接口只需要一个有效 Token：读取缓存（登录失败时沿用未过期的旧 Token），
+# 缓存不可用时才重新登录
+token = None
+if backend_available:
+    try:
+        token, _ = get_token(SESSION, BACKEND_URL, "admin", "admin123")
+        SESSION.headers["Authorization"] = f"Bearer {token}"
+    except Exception as e:
+        print(f"   获取Token失败: {str(e)[:50]}")
+
 # 测试3: 受保护的API访问
 print("\n" + "=" * 70)
 print("测试 3: 受保护的API访问")
 print("=" * 70)
 
+def _describe_index(data):
+    stats = data.get('index_stats', {})
+    return True, f"表: {stats.get('tables', 0)}, 列: {stats.get('columns', 0)}, 术语: {stats.get('business_terms', 0)}"
+
+def _describe_sessions(data):
+    if not data.get("success"):
+        return False, "查询失败"
+    return True, f"找到 {len(data.get('sessions', []))} 个会话"
+
+# 受保护接口的检查表: (路径, 测试名, 根据响应数据返回 (是否通过, 说明))
+PROTECTED_ENDPOINTS = [
+    ("database/status", "数据库状态查询", lambda data: (
+        True, f"连接: {data.get('connected')}, 类型: {data.get('database_type', 'N/A')}"
+    )),
+    ("index/status", "索引状态查询", _describe_index),
+    ("sessions", "会话列表查询", _describe_sessions),
+    ("users", "用户列表查询（管理员）", lambda users: (True, f"找到 {len(users)} 个用户")),
+]
+
 if token:
-    headers = {"Authorization": f"Bearer {token}"}
+    # 各查询互不依赖，一起发出
+    responses = run_concurrently(*(
+        lambda path=path: SESSION.get(f"{BACKEND_URL}/api/protected/{path}", timeout=5)
+        for path, _, _ in PROTECTED_ENDPOINTS
+    ))
     
-    # 数据库状态
-    try:
-        response = requests.get(
-            f"{BACKEND_URL}/api/protected/database/status",
-            headers=headers,
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            log_test("数据库状态查询", True, 
-                    f"连接: {data.get('connected')}, 类型: {data.get('database_type', 'N/A')}")
-        else:
-            log_test("数据库状态查询", False, f"状态码: {response.status_code}")
-    except Exception as e:
-        log_test("数据库状态查询", False, f"错误: {str(e)[:50]}")
-    
-    # 索引状态
-    try:
-        response = requests.get(
-            f"{BACKEND_URL}/api/protected/index/status",
-            headers=headers,
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            stats = data.get('index_stats', {})
-            log_test("索引状态查询", True, 
-                    f"表: {stats.get('tables', 0)}, 列: {stats.get('columns', 0)}, 术语: {stats.get('business_terms', 0)}")
-        else:
-            log_test("索引状态查询", False, f"状态码: {response.status_code}")
-    except Exception as e:
-        log_test("索引状态查询", False, f"错误: {str(e)[:50]}")
-    
-    # 会话列表
-    try:
-        response = requests.get(
-            f"{BACKEND_URL}/api/protected/sessions",
-            headers=headers,
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("success"):
-                sessions = data.get("sessions", [])
-                log_test("会话列表查询", True, f"找到 {len(sessions)} 个会话")
+    for (path, name, describe), response in zip(PROTECTED_ENDPOINTS, responses):
+        try:
+            if isinstance(response, Exception):
+                raise response
+            
+            if response.status_code == 200:
+                log_test(name, *describe(response.json()))
             else:
-                log_test("会话列表查询", False, "查询失败")
-        else:
-            log_test("会话列表查询", False, f"状态码: {response.status_code}")
-    except Exception as e:
-        log_test("会话列表查询", False, f"错误: {str(e)[:50]}")
-    
-    # 用户列表（管理员功能）
-    try:
-        response = requests.get(
-            f"{BACKEND_URL}/api/protected/users",
-            headers=headers,
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            users = response.json()
-            log_test("用户列表查询（管理员）", True, f"找到 {len(users)} 个用户")
-        else:
-            log_test("用户列表查询（管理员）", False, f"状态码: {response.status_code}")
-    except Exception as e:
-        log_test("用户列表查询（管理员）", False, f"错误: {str(e)[:50]}")
+                log_test(name, False, f"状态码: {response.status_code}")
+        except Exception as e:
+            log_test(name, False, f"错误: {str(e)[:50]}")
 else:
     log_test("受保护的API访问", False, "未获取到有效Token，跳过测试")
 
@@ -219,7 +221,7 @@ print("=" * 70)
 
 if backend_available:
     try:
-        response = requests.options(
+        response = SESSION.options(
             f"{BACKEND_URL}/api/public/health",
             headers={"Origin": "http://localhost:5173"},
             timeout=5
@@ -250,10 +252,11 @@ data_files = {
     "data/business_metadata.json": "业务元数据"
 }
 
+data_snapshot = snapshot_dir("data")
+
 for file_path, description in data_files.items():
-    exists = Path(file_path).exists()
-    if exists:
-        size = Path(file_path).stat().st_size
+    if file_path in data_snapshot:
+        size = data_snapshot[file_path]
         log_test(description, True, f"{file_path} ({size} 字节)")
     else:
         log_test(description, False, f"{file_path} 不存在")
@@ -268,9 +271,11 @@ log_files = [
     "frontend.log"
 ]
 
+root_snapshot = snapshot_dir(".")
+
 for log_file in log_files:
-    if Path(log_file).exists():
-        size = Path(log_file).stat().st_size
+    if f"./{log_file}" in root_snapshot:
+        size = root_snapshot[f"./{log_file}"]
         log_test(f"日志文件: {log_file}", True, f"{size} 字节")
     else:
         log_test(f"日志文件: {log_file}", False, "文件不存在（可能未启用日志）")
@@ -283,29 +288,15 @@ print("=" * 70)
 workflow_passed = False
 if backend_available and token:
     try:
-        # 步骤1: 获取数据库状态
-        response = requests.get(
-            f"{BACKEND_URL}/api/protected/database/status",
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=5
-        )
-        step1 = response.status_code == 200
-        
-        # 步骤2: 获取索引状态
-        response = requests.get(
-            f"{BACKEND_URL}/api/protected/index/status",
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=5
-        )
-        step2 = response.status_code == 200
-        
-        # 步骤3: 获取会话列表
-        response = requests.get(
-            f"{BACKEND_URL}/api/protected/sessions",
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=5
+        # 三个步骤都只依赖登录得到的 Token，并发执行
+        responses = run_concurrently(*(
+            lambda path=path: SESSION.get(f"{BACKEND_URL}/api/protected/{path}", timeout=5)
+            for path in ("database/status", "index/status", "sessions")
+        ))
+        step1, step2, step3 = (
+            not isinstance(response, Exception) and response.status_code == 200
+            for response in responses
         )
-        step3 = response.status_code == 200
         
         workflow_passed = step1 and step2 and step3
         
@@ -328,9 +319,8 @@ print("\n" + "=" * 70)
 print("📊 测试总结")
 print("=" * 70)
 
-passed = sum(1 for _, p, _ in TEST_RESULTS if p)
-failed = sum(1 for _, p, _ in TEST_RESULTS if not p)
-total = len(TEST_RESULTS)
+passed, failed = STATS["pass"], STATS["fail"]
+total = passed + failed
 
 print(f"\n总测试数: {total}")
 print(f"✅ 通过: {passed}")
@@ -371,22 +361,21 @@ print(f"说明: {health_desc}")
 
 # 保存测试报告
 report_path = "test_e2e_results.json"
-with open(report_path, 'w', encoding='utf-8') as f:
-    json.dump({
-        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "total": total,
-        "passed": passed,
-        "failed": failed,
-        "pass_rate": f"{passed/total*100:.1f}%",
-        "health_score": health_score,
-        "health_status": health_status,
-        "backend_available": backend_available,
-        "frontend_available": frontend_available,
-        "results": [
-            {"test": name, "passed": p, "message": msg}
-            for name, p, msg in TEST_RESULTS
-        ]
-    }, f, indent=2, ensure_ascii=False)
+dump_json({
+    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    "total": total,
+    "passed": passed,
+    "failed": failed,
+    "pass_rate": f"{passed/total*100:.1f}%",
+    "health_score": health_score,
+    "health_status": health_status,
+    "backend_available": backend_available,
+    "frontend_available": frontend_available,
+    "results": [
+        {"test": name, "passed": p, "message": msg}
+        for name, p, msg in TEST_RESULTS
+    ]
+}, report_path)
 
 print(f"\n📄 E2E测试报告已保存: {report_path}")
 
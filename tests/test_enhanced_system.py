@@ -19,7 +19,7 @@ load_dotenv()
 from tools.vector_store import VectorStore, SearchResult
 from tools.enhanced_tools import EnhancedDatabaseTools
 from tools.agno_tools import db
-from askdb_agno import create_agent
+from _shared import shared_agent
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -112,7 +112,7 @@ class TestAgentIntegration:
     def test_agent_creation(self):
         """测试 Agent 创建"""
         try:
-            agent = create_agent(debug=False, enable_memory=False)
+            agent = shared_agent()
             
             assert agent is not None
             assert hasattr(agent, 'run')
@@ -128,7 +128,7 @@ class TestAgentIntegration:
     def test_agent_simple_query(self):
         """测试 Agent 简单查询"""
         try:
-            agent = create_agent(debug=False, enable_memory=False)
+            agent = shared_agent()
             
             # 测试一个简单的查询
             response = agent.run("列出所有表")
@@ -7,10 +7,11 @@ Frontend 组件测试
 
 import os
 import sys
-import json
 from pathlib import Path
 import subprocess
 
+from _shared import snapshot_dir, file_contains, dump_json, load_json
+
 # 设置编码
 if sys.platform == 'win32':
     import io
@@ -21,11 +22,13 @@ print("AskDB 前端测试")
 print("=" * 70)
 
 TEST_RESULTS = []
+STATS = {"pass": 0, "fail": 0}  # 通过/失败计数，随 log_test 累加
 
 def log_test(test_name, passed, message=""):
     """记录测试结果"""
     status = "✅ 通过" if passed else "❌ 失败"
     TEST_RESULTS.append((test_name, passed, message))
+    STATS["pass" if passed else "fail"] += 1
     print(f"\n{status} - {test_name}")
     if message:
         print(f"   {message}")
@@ -37,8 +40,7 @@ print("=" * 70)
 
 package_json_path = Path("frontend/package.json")
 if package_json_path.exists():
-    with open(package_json_path, 'r', encoding='utf-8') as f:
-        package_data = json.load(f)
+    package_data = load_json(package_json_path)
     
     log_test("package.json 存在", True, "前端配置文件存在")
     
@@ -74,10 +76,14 @@ core_files = {
     "frontend/vite_config.js": "Vite配置"
 }
 
+# 每个目录只扫描一次，之后按路径查表
+files = {}
+for directory in ("frontend", "frontend/src", "frontend/src/components", "frontend/src/store"):
+    files.update(snapshot_dir(directory))
+
 for file_path, description in core_files.items():
-    exists = Path(file_path).exists()
-    if exists:
-        size = Path(file_path).stat().st_size
+    if file_path in files:
+        size = files[file_path]
         log_test(description, True, f"{file_path} ({size} 字节)")
     else:
         log_test(description, False, f"{file_path} 不存在")
@@ -96,13 +102,10 @@ components = {
 }
 
 for file_path, description in components.items():
-    exists = Path(file_path).exists()
-    if exists:
-        size = Path(file_path).stat().st_size
+    if file_path in files:
+        size = files[file_path]
         # 简单检查组件是否导出
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            has_export = 'export' in content
+        has_export = file_contains(file_path, b'export')
         
         log_test(description, has_export, 
                 f"{file_path} ({size} 字节, 包含export)")
@@ -120,11 +123,8 @@ stores = {
 }
 
 for file_path, description in stores.items():
-    exists = Path(file_path).exists()
-    if exists:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            has_zustand = 'zustand' in content or 'create' in content
+    if file_path in files:
+        has_zustand = file_contains(file_path, b'zustand', b'create')
         
         log_test(description, has_zustand, 
                 f"{file_path} (使用 Zustand)")
@@ -172,7 +172,8 @@ print("=" * 70)
 
 try:
     import requests
-    response = requests.get("http://localhost:5173", timeout=2)
+    with requests.Session() as session:
+        response = session.get("http://localhost:5173", timeout=2)
     if response.status_code == 200:
         log_test("前端服务运行", True, "前端在 http://localhost:5173 运行")
     else:
@@ -188,9 +189,8 @@ print("\n" + "=" * 70)
 print("📊 测试总结")
 print("=" * 70)
 
-passed = sum(1 for _, p, _ in TEST_RESULTS if p)
-failed = sum(1 for _, p, _ in TEST_RESULTS if not p)
-total = len(TEST_RESULTS)
+passed, failed = STATS["pass"], STATS["fail"]
+total = passed + failed
 
 print(f"\n总测试数: {total}")
 print(f"✅ 通过: {passed}")
@@ -199,26 +199,25 @@ print(f"通过率: {passed/total*100:.1f}%")
 
 if failed > 0:
     print("\n失败的测试:")
-    for name, passed, message in TEST_RESULTS:
-        if not passed:
+    for name, passed_test, message in TEST_RESULTS:
+        if not passed_test:
             print(f"  ❌ {name}")
             if message:
                 print(f"     {message}")
 
 # 保存测试报告
 report_path = "test_frontend_results.json"
-with open(report_path, 'w', encoding='utf-8') as f:
-    json.dump({
-        "timestamp": __import__('time').strftime("%Y-%m-%d %H:%M:%S"),
-        "total": total,
-        "passed": int(passed),
-        "failed": int(failed),
-        "pass_rate": f"{passed/total*100:.1f}%",
-        "results": [
-            {"test": name, "passed": p, "message": msg}
-            for name, p, msg in TEST_RESULTS
-        ]
-    }, f, indent=2, ensure_ascii=False)
+dump_json({
+    "timestamp": __import__('time').strftime("%Y-%m-%d %H:%M:%S"),
+    "total": total,
+    "passed": int(passed),
+    "failed": int(failed),
+    "pass_rate": f"{passed/total*100:.1f}%",
+    "results": [
+        {"test": name, "passed": p, "message": msg}
+        for name, p, msg in TEST_RESULTS
+    ]
+}, report_path)
 
 print(f"\n📄 前端测试报告已保存: {report_path}")
 
@@ -6,7 +6,7 @@
 
 import os
 import sys
-import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -18,6 +18,21 @@ sys.path.insert(0, str(current_dir))
 
 # 导入后端处理函数
 from backend.main import process_chat_message
+from _shared import dumps_json, print_traceback
+
+def run_one(item):
+    """执行单个查询，返回 (序号, 查询, 结果, 异常)"""
+    idx, query = item
+    try:
+        # 调用后端处理函数
+        result = process_chat_message(
+            message=query,
+            session_id=f"test_flow_session_{idx}",
+            user_context={'id': 1, 'username': 'test_user'}
+        )
+        return idx, query, result, None
+    except Exception as e:
+        return idx, query, None, e
 
 def test_full_flow():
     print("=" * 80)
@@ -31,18 +46,18 @@ def test_full_flow():
         "告诉我courses表的结构"
     ]
     
-    for idx, query in enumerate(test_queries, 1):
+    # 各查询互不依赖（使用不同的会话），并发调用后端，按原顺序输出
+    with ThreadPoolExecutor(max_workers=len(test_queries)) as executor:
+        results = list(executor.map(run_one, enumerate(test_queries, 1)))
+    
+    for idx, query, result, error in results:
         print(f"\n{'=' * 80}")
         print(f"测试 #{idx}: {query}")
         print('=' * 80)
         
         try:
-            # 调用后端处理函数
-            result = process_chat_message(
-                message=query,
-                session_id="test_flow_session",
-                user_context={'id': 1, 'username': 'test_user'}
-            )
+            if error is not None:
+                raise error
             
             # 检查返回结果
             print(f"\n✅ 后端处理成功")
@@ -70,18 +85,17 @@ def test_full_flow():
                 
                 # 模拟前端接收的JSON
                 print(f"\n📡 前端将接收的JSON:")
-                print(json.dumps({
+                print(dumps_json({
                     'success': result.get('success'),
                     'response': result.get('response')[:100] + '...',
                     'tool_calls': tool_calls
-                }, ensure_ascii=False, indent=2))
+                }))
             else:
                 print(f"\n⚠️  未检测到工具调用")
             
         except Exception as e:
             print(f"\n❌ 测试失败: {e}")
-            import traceback
-            traceback.print_exc()
+            print_traceback()
     
     print(f"\n{'=' * 80}")
     print("✅ 所有测试完成")
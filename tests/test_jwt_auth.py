@@ -7,44 +7,49 @@
 import requests
 import time
 import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from _shared import get_token, TOKEN_FILE
 
 BASE_URL = "http://localhost:8000"
 
+# 所有请求共用一个会话，keep-alive 复用连接
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=1, backoff_factor=0.1)
+))
+
 def test_jwt_authentication():
     """测试JWT认证流程"""
     print("=" * 60)
     print("JWT 认证测试")
     print("=" * 60)
     
-    # 1. 登录获取token
+    # 1. 登录获取token（始终真正登录，Token 写入缓存文件供之后的测试复用）
     print("\n1. 测试登录...")
-    login_data = {
-        "username": "admin",
-        "password": "admin123"
-    }
-    
-    response = requests.post(f"{BASE_URL}/api/auth/login", json=login_data)
-    print(f"状态码: {response.status_code}")
-    
-    if response.status_code != 200:
-        print(f"❌ 登录失败: {response.text}")
-        return
+    try:
+        token, result = get_token(SESSION, BASE_URL, "admin", "admin123", force=True)
+    except RuntimeError as e:
+        print(f"❌ 登录失败: {e}")
+        raise
     
-    result = response.json()
+    assert result['user']['username'] == "admin", f"登录用户不正确: {result['user']}"
     print(f"✅ 登录成功")
     print(f"   用户: {result['user']['username']}")
     print(f"   类型: {result['user']['user_type']}")
     
-    token = result['token']
     print(f"\n获得JWT Token (前30字符): {token[:30]}...")
     
-    # 2. 使用token访问受保护的API
+    # 2. 使用token访问受保护的API（通过 get_token 读取第 1 步写入的缓存，不再登录）
     print("\n2. 测试使用token访问受保护的API...")
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
+    token, _ = get_token(SESSION, BASE_URL, "admin", "admin123")
+    SESSION.headers["Authorization"] = f"Bearer {token}"
+    
+    response = SESSION.get(f"{BASE_URL}/api/protected/database/status")
     
-    response = requests.get(f"{BASE_URL}/api/protected/database/status", headers=headers)
     print(f"状态码: {response.status_code}")
     
     if response.status_code == 200:
@@ -58,7 +63,7 @@ def test_jwt_authentication():
     # 3. 验证token
     print("\n3. 测试token验证接口...")
     verify_data = {"token": token}
-    response = requests.post(f"{BASE_URL}/api/auth/verify", json=verify_data)
+    response = SESSION.post(f"{BASE_URL}/api/auth/verify", json=verify_data)
     
     if response.status_code == 200:
         result = response.json()
@@ -70,11 +75,8 @@ def test_jwt_authentication():
     else:
         print(f"❌ 验证请求失败: {response.text}")
     
-    # 4. 保存token供后续测试使用
-    print("\n4. 保存token到文件...")
-    with open("test_token.txt", "w") as f:
-        f.write(token)
-    print("✅ Token已保存到 test_token.txt")
+    # 4. 保存token供后续测试使用（get_token 已写入缓存文件）
+    print(f"\n4. ✅ Token已保存到 {TOKEN_FILE}")
     
     print("\n" + "=" * 60)
     print("测试说明：")
@@ -90,17 +92,14 @@ def test_token_from_file():
     print("=" * 60)
     
     try:
-        with open("test_token.txt", "r") as f:
-            token = f.read().strip()
+        token = TOKEN_FILE.read_text().strip()
         
         print(f"\n从文件读取Token (前30字符): {token[:30]}...")
         
-        headers = {
-            "Authorization": f"Bearer {token}"
-        }
+        SESSION.headers["Authorization"] = f"Bearer {token}"
         
         print("\n测试访问受保护的API...")
-        response = requests.get(f"{BASE_URL}/api/protected/database/status", headers=headers)
+        response = SESSION.get(f"{BASE_URL}/api/protected/database/status")
         
         if response.status_code == 200:
             print("✅ Token仍然有效！后端重启不影响认证")
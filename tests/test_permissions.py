@@ -5,136 +5,118 @@
 
 import os
 import sys
+from collections import namedtuple
 from pathlib import Path
 
+import pytest
+
 # 添加项目根目录到路径
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 from lib.permissions import PermissionChecker, PermissionDeniedException
+from _shared import print_traceback
 
 
-def test_permission_checker():
-    """测试权限检查器"""
-    print("=" * 80)
-    print("测试数据脱敏与行级权限控制")
-    print("=" * 80)
-    
-    checker = PermissionChecker()
-    
-    # 测试用例
-    test_cases = [
-        {
-            "name": "admin用户查询students表",
-            "username": "admin",
-            "sql": "SELECT * FROM students",
-            "expected": "不应该被修改"
-        },
-        {
-            "name": "teach开头用户查询students表",
-            "username": "teach001",
-            "sql": "SELECT * FROM students",
-            "expected": "不应该被修改（可以看到所有students）"
-        },
-        {
-            "name": "stu开头用户查询students表",
-            "username": "stu001",
-            "sql": "SELECT * FROM students",
-            "expected": "应该添加 WHERE sid = 'stu001'"
-        },
-        {
-            "name": "teach开头用户查询teacher表",
-            "username": "teach001",
-            "sql": "SELECT * FROM teacher",
-            "expected": "应该添加 WHERE tid = 'teach001'"
-        },
-        {
-            "name": "stu开头用户查询teacher表",
-            "username": "stu001",
-            "sql": "SELECT * FROM teacher",
-            "expected": "应该被拒绝或返回空结果"
-        },
-        {
-            "name": "teach开头用户查询choices表",
-            "username": "teach001",
-            "sql": "SELECT * FROM choices",
-            "expected": "应该添加 WHERE tid = 'teach001'"
-        },
-        {
-            "name": "stu开头用户查询choices表",
-            "username": "stu001",
-            "sql": "SELECT * FROM choices",
-            "expected": "应该添加 WHERE sid = 'stu001'"
-        },
-        {
-            "name": "复杂查询 - stu用户JOIN查询",
-            "username": "stu002",
-            "sql": "SELECT s.*, c.* FROM students s JOIN choices c ON s.sid = c.sid",
-            "expected": "应该添加权限过滤条件"
-        },
-        {
-            "name": "带WHERE子句的查询",
-            "username": "stu003",
-            "sql": "SELECT * FROM students WHERE age > 18",
-            "expected": "应该在现有WHERE基础上添加 AND sid = 'stu003'"
-        },
-    ]
-    
-    print("\n开始测试...\n")
+# 行级权限转换测试用例（模块加载时构建一次）
+# expected 为正确的转换结果，None 表示应被拒绝；known_bug 非空的用例是 lib/permissions.py
+# 的已知缺陷，标记为 xfail(strict=True)，缺陷修复后需移除标记
+Case = namedtuple("Case", "name username user_type sql expected known_bug", defaults=(None,))
+
+_UNQUOTED = "行过滤条件中的 {username} 替换后未加引号，会被当作列名"
+
+TEST_CASES = (
+    Case("admin用户查询students表", "admin", "manager", "SELECT * FROM students",
+         "SELECT * FROM students"),
+    Case("teach开头用户查询students表", "teach001", "teacher", "SELECT * FROM students",
+         "SELECT * FROM students"),
+    Case("stu开头用户查询students表", "stu001", "student", "SELECT * FROM students",
+         "SELECT * FROM students WHERE (sid = 'stu001')", _UNQUOTED),
+    Case("teach开头用户查询teacher表", "teach001", "teacher", "SELECT * FROM teacher",
+         "SELECT * FROM teacher WHERE (tid = 'teach001')", _UNQUOTED),
+    Case("stu开头用户查询teacher表", "stu001", "student", "SELECT * FROM teacher",
+         None),
+    Case("teach开头用户查询choices表", "teach001", "teacher", "SELECT * FROM choices",
+         "SELECT * FROM choices WHERE (tid = 'teach001')", _UNQUOTED),
+    Case("stu开头用户查询choices表", "stu001", "student", "SELECT * FROM choices",
+         "SELECT * FROM choices WHERE (sid = 'stu001')", _UNQUOTED),
+    Case("复杂查询 - stu用户JOIN查询", "stu002", "student", "SELECT s.*, c.* FROM students s JOIN choices c ON s.sid = c.sid",
+         "SELECT s.*, c.* FROM students s JOIN choices c ON s.sid = c.sid WHERE (s.sid = 'stu002') AND (c.sid = 'stu002')",
+         "只过滤 FROM 后的第一张表，且过滤列未带表别名"),
+    Case("带WHERE子句的查询", "stu003", "student", "SELECT * FROM students WHERE age > 18",
+         "SELECT * FROM students WHERE (age > 18) AND (sid = 'stu003')",
+         "WHERE 后多出一个空格，且 " + _UNQUOTED),
+)
+
+# 列级访问控制测试用例: (用户名, 用户类型, 表, 列, 是否允许)
+COLUMN_ACCESS_CASES = (
+    ("admin", "manager", "students", "sid", True),
+    ("teach001", "teacher", "students", "name", True),
+    ("stu001", "student", "students", "age", True),
+    ("stu001", "student", "teacher", "tid", False),  # stu用户不能访问teacher表
+)
+
+
+@pytest.fixture(scope="session")
+def checker():
+    """整个测试会话只加载一次权限配置"""
+    return PermissionChecker()
+
+
+def run_permission_case(checker, i, test_case):
+    """执行单个行级权限转换用例并输出结果，返回转换后的SQL，被拒绝时返回 None"""
+    print(f"\n{'='*80}")
+    print(f"测试 {i}: {test_case.name}")
+    print(f"{'='*80}")
+    print(f"用户名: {test_case.username} ({test_case.user_type})")
+    print(f"原始SQL: {test_case.sql}")
+    print(f"预期结果: {test_case.expected or '拒绝'}")
+    print()
     
-    for i, test_case in enumerate(test_cases, 1):
-        print(f"\n{'='*80}")
-        print(f"测试 {i}: {test_case['name']}")
-        print(f"{'='*80}")
-        print(f"用户名: {test_case['username']}")
-        print(f"原始SQL: {test_case['sql']}")
-        print(f"预期结果: {test_case['expected']}")
-        print()
+    try:
+        transformed_sql, warnings = checker.check_and_transform_query(
+            test_case.sql,
+            test_case.username,
+            test_case.user_type
+        )
         
-        try:
-            transformed_sql, warnings = checker.check_and_transform_query(
-                test_case['sql'],
-                test_case['username']
-            )
-            
-            print(f"✅ 转换成功")
-            print(f"转换后SQL: {transformed_sql}")
-            
-            if warnings:
-                print(f"警告信息: {warnings}")
+        print(f"✅ 转换成功")
+        print(f"转换后SQL: {transformed_sql}")
+        
+        if warnings:
+            print(f"警告信息: {warnings}")
+        
+        if transformed_sql != test_case.sql:
+            print(f"🔒 SQL已被修改（权限控制生效）")
+        else:
+            print(f"ℹ️  SQL未被修改")
+        
+        return transformed_sql
             
-            if transformed_sql != test_case['sql']:
-                print(f"🔒 SQL已被修改（权限控制生效）")
-            else:
-                print(f"ℹ️  SQL未被修改")
-                
-        except PermissionDeniedException as e:
-            print(f"🚫 权限被拒绝: {e}")
-        except Exception as e:
-            print(f"❌ 测试失败: {e}")
-            import traceback
-            traceback.print_exc()
-
-
-def test_column_access():
+    except PermissionDeniedException as e:
+        print(f"🚫 权限被拒绝: {e}")
+        return None
+
+
+@pytest.mark.parametrize("i, test_case", [
+    pytest.param(
+        i, test_case, id=test_case.name,
+        marks=pytest.mark.xfail(strict=True, reason=test_case.known_bug) if test_case.known_bug else ()
+    )
+    for i, test_case in enumerate(TEST_CASES, 1)
+])
+def test_permission_transform(checker, i, test_case):
+    """测试行级权限转换"""
+    assert run_permission_case(checker, i, test_case) == test_case.expected
+
+
+@pytest.mark.parametrize("username, user_type, table, column, expected", COLUMN_ACCESS_CASES)
+def test_column_access(checker, username, user_type, table, column, expected):
     """测试列级访问控制"""
-    print("\n" + "=" * 80)
-    print("测试列级访问控制")
-    print("=" * 80)
-    
-    checker = PermissionChecker()
-    
-    test_cases = [
-        ("admin", "students", "sid", True),
-        ("teach001", "students", "name", True),
-        ("stu001", "students", "age", True),
-        ("stu001", "teacher", "tid", False),  # stu用户不能访问teacher表
-    ]
-    
-    for username, table, column, expected in test_cases:
-        result = checker.check_column_access(table, column, username)
-        status = "✅" if result == expected else "❌"
-        print(f"{status} 用户 {username} 访问 {table}.{column}: {result} (预期: {expected})")
+    result = checker.check_column_access(table, column, username, user_type)
+    status = "✅" if result == expected else "❌"
+    print(f"{status} 用户 {username} 访问 {table}.{column}: {result} (预期: {expected})")
+    assert result == expected
 
 
 def test_config_reload():
@@ -152,8 +134,24 @@ def test_config_reload():
 
 if __name__ == "__main__":
     try:
-        test_permission_checker()
-        test_column_access()
+        print("=" * 80)
+        print("测试数据脱敏与行级权限控制")
+        print("=" * 80)
+        print("\n开始测试...\n")
+        
+        checker = PermissionChecker()
+        for i, test_case in enumerate(TEST_CASES, 1):
+            run_permission_case(checker, i, test_case)
+        
+        print("\n" + "=" * 80)
+        print("测试列级访问控制")
+        print("=" * 80)
+        for case in COLUMN_ACCESS_CASES:
+            try:
+                test_column_access(checker, *case)
+            except AssertionError:
+                pass
+        
         test_config_reload()
         
         print("\n" + "=" * 80)
@@ -162,7 +160,6 @@ if __name__ == "__main__":
         
     except Exception as e:
         print(f"\n❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        print_traceback()
         sys.exit(1)
 
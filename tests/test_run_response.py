@@ -5,10 +5,11 @@
 """
 
 import os
+import sqlite3
 import sys
+from contextlib import closing
 from pathlib import Path
 from dotenv import load_dotenv
-import json
 
 load_dotenv()
 
@@ -16,16 +17,26 @@ load_dotenv()
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-from askdb_agno import create_agent
+from _shared import dumps_json, loads_json, print_section, print_traceback, shared_agent
+
+SESSIONS_DB = current_dir / "data" / "askdb_sessions.db"
+
+# 设置 ASKDB_DUMP_ATTRS=1 时才列出全部属性并转储完整对象
+DUMP_ATTRS = os.environ.get("ASKDB_DUMP_ATTRS") == "1"
+
+# Agno 把会话的所有运行记录以 JSON 列表存在 agno_sessions.runs 中（见 check_agno_sessions.py）
+LATEST_SESSION_RUNS_SQL = "SELECT runs FROM agno_sessions WHERE session_id = ?"
+# 最新一次运行中要查看的字段；长内容字段只打印前 200 字符
+RUN_FIELDS = ("run_id", "created_at", "content", "tools")
+LONG_RUN_FIELDS = frozenset(("content", "tools"))
+
 
 def main():
-    print("=" * 80)
-    print("测试 Agno Agent RunResponse 对象")
-    print("=" * 80)
+    print_section("测试 Agno Agent RunResponse 对象", gap=False)
     
     print("\n创建 Agent (启用 show_tool_calls)...")
     try:
-        agent = create_agent(debug=False, enable_memory=True, session_id="test_session")
+        agent = shared_agent(enable_memory=True, session_id="test_session")
         print("✓ Agent 创建成功\n")
         
         # 测试一个会调用工具的查询
@@ -37,27 +48,28 @@ def main():
         # 执行查询
         response = agent.run(test_query)
         
-        print("\n" + "=" * 80)
-        print("RunResponse 对象分析")
-        print("=" * 80)
+        print_section("RunResponse 对象分析")
         
         # 1. 基本信息
         print(f"\n【类型】: {type(response)}")
         print(f"【类名】: {response.__class__.__name__}")
         
         # 2. 所有属性
-        print("\n【所有属性】:")
-        attrs = [attr for attr in dir(response) if not attr.startswith('_')]
-        for i, attr in enumerate(attrs, 1):
-            print(f"  {i:2d}. {attr}")
+        # dir() 只调用一次，后续属性探测都查这个集合
+        all_attrs = dir(response)
+        response_attrs = set(all_attrs)
+        if DUMP_ATTRS:
+            print("\n【所有属性】:")
+            print("\n".join(
+                f"  {i:2d}. {attr}"
+                for i, attr in enumerate((attr for attr in all_attrs if attr[0] != '_'), 1)
+            ))
         
         # 3. 关键属性值
-        print("\n" + "=" * 80)
-        print("【关键属性详情】")
-        print("=" * 80)
+        print_section("【关键属性详情】")
         
         # content - 最终响应文本
-        if hasattr(response, 'content'):
+        if 'content' in response_attrs:
             content = response.content
             print(f"\n📝 content (响应文本):")
             print(f"   类型: {type(content)}")
@@ -66,7 +78,7 @@ def main():
                 print(f"   预览: {content[:200]}...")
         
         # messages - 消息列表
-        if hasattr(response, 'messages'):
+        if 'messages' in response_attrs:
             messages = response.messages
             print(f"\n💬 messages (消息列表):")
             print(f"   类型: {type(messages)}")
@@ -83,47 +95,45 @@ def main():
         
         # tools - 工具调用（可能的属性名）
         for attr_name in ['tools', 'tool_calls', 'tools_used', 'tool_results']:
-            if hasattr(response, attr_name):
+            if attr_name in response_attrs:
                 tools = getattr(response, attr_name)
                 print(f"\n🔧 {attr_name} (工具信息):")
                 print(f"   类型: {type(tools)}")
                 if tools:
-                    print(f"   内容: {json.dumps(tools, ensure_ascii=False, indent=2, default=str)}")
+                    print(f"   内容: {dumps_json(tools, default=str)}")
         
         # runs - 运行步骤
-        if hasattr(response, 'runs'):
+        if 'runs' in response_attrs:
             runs = response.runs
             print(f"\n🏃 runs (运行步骤):")
             print(f"   类型: {type(runs)}")
             print(f"   数量: {len(runs) if runs else 0}")
         
         # metrics - 指标信息
-        if hasattr(response, 'metrics'):
+        if 'metrics' in response_attrs:
             metrics = response.metrics
             print(f"\n📊 metrics (指标):")
             print(f"   类型: {type(metrics)}")
             if metrics and hasattr(metrics, '__dict__'):
-                print(f"   内容: {json.dumps(metrics.__dict__, ensure_ascii=False, indent=2, default=str)}")
+                print(f"   内容: {dumps_json(metrics.__dict__, default=str)}")
         
         # 4. 尝试访问嵌套的工具调用信息
-        print("\n" + "=" * 80)
-        print("【工具调用信息提取】")
-        print("=" * 80)
+        print_section("【工具调用信息提取】")
         
         tool_calls_found = []
         
         # 方法1: 直接从 response
-        if hasattr(response, 'tool_calls') and response.tool_calls:
+        if 'tool_calls' in response_attrs and response.tool_calls:
             tool_calls_found.append(("response.tool_calls", response.tool_calls))
         
         # 方法2: 从 messages
-        if hasattr(response, 'messages') and response.messages:
+        if 'messages' in response_attrs and response.messages:
             for i, msg in enumerate(response.messages):
                 if hasattr(msg, 'tool_calls') and msg.tool_calls:
                     tool_calls_found.append((f"messages[{i}].tool_calls", msg.tool_calls))
         
         # 方法3: 从 runs
-        if hasattr(response, 'runs') and response.runs:
+        if 'runs' in response_attrs and response.runs:
             for i, run in enumerate(response.runs):
                 if hasattr(run, 'tool_calls') and run.tool_calls:
                     tool_calls_found.append((f"runs[{i}].tool_calls", run.tool_calls))
@@ -137,13 +147,14 @@ def main():
                 for j, call in enumerate(calls if isinstance(calls, list) else [calls], 1):
                     print(f"\n   工具调用 {j}:")
                     if hasattr(call, '__dict__'):
+                        lines = []
                         for key, value in call.__dict__.items():
                             if key == 'function' and hasattr(value, '__dict__'):
-                                print(f"     {key}:")
-                                for fkey, fvalue in value.__dict__.items():
-                                    print(f"       {fkey}: {fvalue}")
+                                lines.append(f"     {key}:")
+                                lines.extend(f"       {fkey}: {fvalue}" for fkey, fvalue in value.__dict__.items())
                             else:
-                                print(f"     {key}: {value}")
+                                lines.append(f"     {key}: {value}")
+                        print("\n".join(lines))
                     else:
                         print(f"     {call}")
         else:
@@ -154,57 +165,38 @@ def main():
             print("   3. 需要查看数据库中的历史记录")
         
         # 5. 完整对象转储
-        print("\n" + "=" * 80)
-        print("【完整对象结构 (__dict__)】")
-        print("=" * 80)
-        
-        if hasattr(response, '__dict__'):
-            print(json.dumps(response.__dict__, ensure_ascii=False, indent=2, default=str))
+        if DUMP_ATTRS and '__dict__' in response_attrs:
+            print_section("【完整对象结构 (__dict__)】")
+            print(dumps_json(response.__dict__, default=str))
         
         # 6. 从数据库查询工具调用
-        print("\n" + "=" * 80)
-        print("【从数据库查询工具调用】")
-        print("=" * 80)
+        print_section("【从数据库查询工具调用】")
         
         try:
-            import sqlite3
-            db_path = Path(__file__).parent / "data" / "askdb_sessions.db"
-            if db_path.exists():
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
-                
-                # 查看表结构
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                tables = cursor.fetchall()
-                print(f"\n数据库表: {[t[0] for t in tables]}")
-                
-                # 查询 runs 表
-                cursor.execute("SELECT * FROM runs WHERE session_id = ? ORDER BY created_at DESC LIMIT 1", 
-                              ("test_session",))
-                run = cursor.fetchone()
+            if SESSIONS_DB.exists():
+                with closing(sqlite3.connect(SESSIONS_DB)) as conn:
+                    row = conn.execute(LATEST_SESSION_RUNS_SQL, ("test_session",)).fetchone()
                 
-                if run:
-                    cursor.execute("PRAGMA table_info(runs)")
-                    columns = [col[1] for col in cursor.fetchall()]
-                    run_dict = dict(zip(columns, run))
-                    
-                    print(f"\n最新的 run 记录:")
-                    for key, value in run_dict.items():
-                        if key in ['name', 'response', 'tools', 'tool_calls']:
-                            print(f"  {key}: {str(value)[:200]}...")
-                        else:
-                            print(f"  {key}: {value}")
+                runs = loads_json(row[0]) if row and row[0] else []
+                if runs:
+                    run = runs[-1]
+                    print(f"\n最新的 run 记录（共 {len(runs)} 条）:")
+                    print("\n".join(
+                        f"  {key}: {str(run.get(key))[:200]}..." if key in LONG_RUN_FIELDS
+                        else f"  {key}: {run.get(key)}"
+                        for key in RUN_FIELDS
+                    ))
+                else:
+                    print("\n该会话没有 run 记录")
                 
-                conn.close()
             else:
-                print(f"\n数据库文件不存在: {db_path}")
+                print(f"\n数据库文件不存在: {SESSIONS_DB}")
         except Exception as e:
             print(f"\n查询数据库失败: {e}")
         
     except Exception as e:
         print(f"\n❌ 错误: {e}")
-        import traceback
-        traceback.print_exc()
+        print_traceback()
 
 if __name__ == "__main__":
     main()
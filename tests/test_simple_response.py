@@ -12,6 +12,8 @@ os.environ.setdefault('DEFAULT_DB_NAME', ':memory:')
 
 sys.path.insert(0, str(Path(__file__).parent))
 
+from _shared import file_contains
+
 # 模拟测试
 print("=" * 80)
 print("Agno RunResponse 对象结构分析")
@@ -50,9 +52,8 @@ print("=" * 80)
 # 检查后端实现
 backend_file = Path(__file__).parent / "backend" / "main.py"
 if backend_file.exists():
-    content = backend_file.read_text(encoding='utf-8')
-    
-    if 'tool_calls' in content and 'response.tool_calls' in content:
+    # 按字节查找，命中即返回，不解码整个文件（含 response.tool_calls 即含 tool_calls）
+    if file_contains(backend_file, b'response.tool_calls'):
         print("\n✅ 后端已实现工具调用信息提取")
         print("   位置: backend/main.py - process_chat_message()")
     else:
@@ -61,11 +62,9 @@ if backend_file.exists():
 # 检查 agent 配置
 agent_file = Path(__file__).parent / "askdb_agno.py"
 if agent_file.exists():
-    content = agent_file.read_text(encoding='utf-8')
-    
-    if '"show_tool_calls": True' in content:
+    if file_contains(agent_file, b'"show_tool_calls": True'):
         print("✅ Agent 已启用 show_tool_calls")
-    elif '"show_tool_calls": False' in content or '# "show_tool_calls"' in content:
+    elif file_contains(agent_file, b'"show_tool_calls": False', b'# "show_tool_calls"'):
         print("⚠️  Agent 未启用 show_tool_calls")
 
 print("\n" + "=" * 80)
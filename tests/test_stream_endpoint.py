@@ -6,15 +6,65 @@
 import asyncio
 import json
 
+from _shared import loads_json, print_section, print_traceback
+
+# SSE 数据行前缀和帧分隔符（后端每个事件一行 data，以空行结尾）
+_DATA_PREFIX = b'data: '
+_DATA_PREFIX_LEN = len(_DATA_PREFIX)
+_FRAME_END = b'\n\n'
+
+
+async def iter_sse_data(reader):
+    """
+    按 SSE 帧逐个产出 data 字段的字节内容
+    
+    自行缓冲 reader 的原始数据块再切分帧，分隔符跨数据块或单帧超过
+    StreamReader 的行长度上限时都不会丢帧
+    """
+    buffer = bytearray()
+    async for chunk in reader.iter_any():
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(_FRAME_END, start)) != -1:
+            data = [
+                line[_DATA_PREFIX_LEN:]
+                for line in bytes(buffer[start:end]).split(b'\n')
+                if line.startswith(_DATA_PREFIX)
+            ]
+            if data:
+                yield b'\n'.join(data)
+            start = end + len(_FRAME_END)
+        del buffer[:start]
+
+
+# 复用的 HTTP 会话（多次调用共享连接池和 DNS 缓存）
+_session = None
+
+
+async def _get_session():
+    """返回复用的 ClientSession，首次调用时创建"""
+    global _session
+    if _session is None or _session.closed:
+        import aiohttp
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=8, ttl_dns_cache=300, keepalive_timeout=60)
+        )
+    return _session
+
+
+async def _close_session():
+    """关闭复用的 ClientSession（必须在创建它的事件循环中调用）"""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
 async def test_stream_endpoint():
     """测试流式端点"""
-    print("=" * 60)
-    print("测试流式端点 - 检查SSE事件")
-    print("=" * 60)
+    print_section("测试流式端点 - 检查SSE事件", 60, gap=False)
     
     # 模拟前端请求
-    import aiohttp
-    
     url = "http://localhost:8000/api/protected/chat/stream"
     params = {
         "message": "列出所有数据库表",
@@ -45,75 +95,78 @@ async def test_stream_endpoint():
     print()
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params, headers=headers) as response:
-                print(f"状态码: {response.status}")
-                print()
-                
-                if response.status != 200:
-                    text = await response.text()
-                    print(f"错误响应: {text}")
-                    return
+        session = await _get_session()
+        async with session.get(url, params=params, headers=headers) as response:
+            print(f"状态码: {response.status}")
+            print()
+            
+            if response.status != 200:
+                text = await response.text()
+                print(f"错误响应: {text}")
+                return
+            
+            print("接收到的 SSE 事件:")
+            print("-" * 60)
+            
+            event_count = 0
+            tool_call_start_count = 0
+            tool_call_result_count = 0
+            content_count = 0
+            
+            # 按 SSE 帧（以空行结尾）读取，直接解析字节，不逐行解码
+            async for payload in iter_sse_data(response.content):
+                event_count += 1
+                data = loads_json(payload)
                 
-                print("接收到的 SSE 事件:")
-                print("-" * 60)
+                event_type = data.get('type')
                 
-                event_count = 0
-                tool_call_start_count = 0
-                tool_call_result_count = 0
-                content_count = 0
-                
-                async for line in response.content:
-                    line = line.decode('utf-8').strip()
+                if event_type == 'tool_call_start':
+                    tool_call_start_count += 1
+                    print(f"[{event_count}] TOOL_START: {data['data']['name']}")
+                    print(f"    参数: {json.dumps(data['data']['arguments'], ensure_ascii=False)}")
                     
-                    if line.startswith('data: '):
-                        event_count += 1
-                        data = json.loads(line[6:])
-                        
-                        event_type = data.get('type')
-                        
-                        if event_type == 'tool_call_start':
-                            tool_call_start_count += 1
-                            print(f"[{event_count}] TOOL_START: {data['data']['name']}")
-                            print(f"    参数: {json.dumps(data['data']['arguments'], ensure_ascii=False)}")
-                            
-                        elif event_type == 'tool_call_result':
-                            tool_call_result_count += 1
-                            result = str(data['data']['result'])[:100]
-                            print(f"[{event_count}] TOOL_RESULT: {data['data']['name']}")
-                            print(f"    结果: {result}...")
-                            
-                        elif event_type == 'content':
-                            content_count += 1
-                            print(f"[{event_count}] CONTENT: {repr(data['content'][:50])}")
-                            
-                        elif event_type == 'done':
-                            print(f"[{event_count}] DONE")
-                            
-                        elif event_type == 'error':
-                            print(f"[{event_count}] ERROR: {data['content']}")
-                
-                print()
-                print("=" * 60)
-                print("统计:")
-                print(f"  总事件数: {event_count}")
-                print(f"  工具调用开始: {tool_call_start_count}")
-                print(f"  工具调用结果: {tool_call_result_count}")
-                print(f"  内容块: {content_count}")
-                print()
-                
-                if tool_call_start_count > 0:
-                    print("✅ 工具调用事件正常")
-                else:
-                    print("❌ 没有工具调用事件")
+                elif event_type == 'tool_call_result':
+                    tool_call_result_count += 1
+                    result = str(data['data']['result'])[:100]
+                    print(f"[{event_count}] TOOL_RESULT: {data['data']['name']}")
+                    print(f"    结果: {result}...")
                     
+                elif event_type == 'content':
+                    content_count += 1
+                    print(f"[{event_count}] CONTENT: {repr(data['content'][:50])}")
+                    
+                elif event_type == 'done':
+                    print(f"[{event_count}] DONE")
+                    
+                elif event_type == 'error':
+                    print(f"[{event_count}] ERROR: {data['content']}")
+            
+            print()
+            print("=" * 60)
+            print("统计:")
+            print(f"  总事件数: {event_count}")
+            print(f"  工具调用开始: {tool_call_start_count}")
+            print(f"  工具调用结果: {tool_call_result_count}")
+            print(f"  内容块: {content_count}")
+            print()
+            
+            if tool_call_start_count > 0:
+                print("✅ 工具调用事件正常")
+            else:
+                print("❌ 没有工具调用事件")
+                
     except Exception as e:
         print(f"\n错误: {e}")
-        import traceback
-        traceback.print_exc()
+        print_traceback()
+
+async def main():
+    try:
+        await test_stream_endpoint()
+    finally:
+        await _close_session()
 
 if __name__ == '__main__':
-    asyncio.run(test_stream_endpoint())
+    asyncio.run(main())
 
 
 
@@ -5,7 +5,7 @@
 
 import asyncio
 import json
-from askdb_agno import create_agent
+from _shared import print_traceback, shared_agent
 from agno.agent import RunEvent
 
 async def test_streaming_with_tools_fixed():
@@ -15,7 +15,7 @@ async def test_streaming_with_tools_fixed():
     print("=" * 60)
     
     # 创建 agent
-    agent = create_agent(debug=False, enable_memory=False)
+    agent = shared_agent()
     
     # 测试查询 - 应该会触发语义检索
     query = "查询一下数据库中有哪些表"
@@ -78,8 +78,7 @@ async def test_streaming_with_tools_fixed():
     
     except Exception as e:
         print(f"\n[ERROR] {e}")
-        import traceback
-        traceback.print_exc()
+        print_traceback()
     
     print("\n\n")
     print("=" * 60)
@@ -5,7 +5,7 @@
 
 import asyncio
 import json
-from askdb_agno import create_agent
+from _shared import shared_agent
 from agno.agent import RunContentEvent, ToolCallStartedEvent, ToolCallCompletedEvent
 
 async def test_streaming():
@@ -15,7 +15,7 @@ async def test_streaming():
     print("=" * 60)
     
     # 创建 agent（不使用memory以简化测试）
-    agent = create_agent(debug=False, enable_memory=False)
+    agent = shared_agent()
     
     # 测试查询
     query = "列出所有数据库表"
@@ -5,36 +5,71 @@
 
 import asyncio
 import json
-from askdb_agno import create_agent
+import sys
+from _shared import dumps_json, print_section, print_traceback, shared_agent
 from agno.agent import RunContentEvent, ToolCallStartedEvent, ToolCallCompletedEvent
 
+# 流结束标记
+_STREAM_END = object()
+
+
+def _preview(value, limit=300):
+    """
+    截取结果预览
+    
+    字符串和字节串直接切片；其他对象序列化成 JSON 再截断，不走逐层的 str()
+    
+    Returns:
+        (预览文本, 是否被截断)
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return value[:limit].decode('utf-8', 'replace'), len(value) > limit
+    if not isinstance(value, str):
+        value = dumps_json(value, default=str)
+    return value[:limit], len(value) > limit
+
 async def test_web_search_streaming():
     """测试流式响应（Web搜索工具）"""
-    print("=" * 60)
-    print("测试 Agno 流式实现 - Web搜索工具调用")
-    print("=" * 60)
+    print_section("测试 Agno 流式实现 - Web搜索工具调用", 60, gap=False)
     
     # 创建 agent（不使用memory以简化测试）
-    agent = create_agent(debug=False, enable_memory=False)
+    agent = shared_agent()
     
     # 测试查询 - 明确需要搜索网络
     query = "搜索一下Python编程语言的最新版本"
     print(f"\n[查询] {query}")
     print("-" * 60)
     
-    # 使用流式API
+    # 使用流式API：与后端一样需要 stream_events=True 才会收到工具调用事件
     print("\n[开始] 流式处理...")
-    stream = agent.run(query, stream=True)
+    stream = agent.run(query, stream=True, stream_events=True)
     
     content_chunks = []
     tool_calls = []
     event_count = 0
     
+    # 内容先缓冲，攒够一定字符数再写出，避免每个 token 都 flush 一次
+    pending_content = []
+    pending_chars = 0
+    
+    def flush_pending():
+        nonlocal pending_chars
+        if pending_content:
+            sys.stdout.write(''.join(pending_content))
+            sys.stdout.flush()
+            pending_content.clear()
+            pending_chars = 0
+    
     print("\n[事件流]")
     print("-" * 60)
     
     try:
-        for chunk in stream:
+        # agent.run 返回的是同步生成器，逐个事件放到线程里取，避免阻塞事件循环
+        iterator = iter(stream)
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, _STREAM_END)
+            if chunk is _STREAM_END:
+                break
             event_count += 1
             
             if isinstance(chunk, RunContentEvent):
@@ -43,9 +78,16 @@ async def test_web_search_streaming():
                 if content:
                     content_chunks.append(content)
                     # 显示内容但不换行，模拟真实流式效果
-                    print(content, end='', flush=True)
+                    pending_content.append(content)
+                    pending_chars += len(content)
+                    if pending_chars >= 256:
+                        flush_pending()
+                continue
+            
+            # 其他事件之前先把缓冲的内容写出，保证输出顺序
+            flush_pending()
             
-            elif isinstance(chunk, ToolCallStartedEvent):
+            if isinstance(chunk, ToolCallStartedEvent):
                 # 工具调用开始
                 tool = chunk.tool
                 tool_name = getattr(tool, 'tool_name', 'unknown')
@@ -68,8 +110,8 @@ async def test_web_search_streaming():
                 tool_result = getattr(tool, 'result', '')
                 
                 # 截断长结果
-                result_preview = str(tool_result)[:300]
-                if len(str(tool_result)) > 300:
+                result_preview, truncated = _preview(tool_result)
+                if truncated:
                     result_preview += "\n... (结果过长，已截断)"
                 
                 print(f"\n[TOOL_DONE] {tool_name}")
@@ -80,15 +122,14 @@ async def test_web_search_streaming():
                     if tc['name'] == tool_name and tc['result'] is None:
                         tc['result'] = tool_result
                         break
+        flush_pending()
     except Exception as e:
+        flush_pending()
         print(f"\n[ERROR] 流式处理出错: {e}")
-        import traceback
-        traceback.print_exc()
+        print_traceback()
     
     print("\n\n")
-    print("=" * 60)
-    print("[完成] 流式处理完成")
-    print("=" * 60)
+    print_section("[完成] 流式处理完成", 60, gap=False)
     
     # 输出统计
     full_content = ''.join(content_chunks)
@@ -135,14 +176,10 @@ async def test_web_search_streaming():
         print("   [INFO] 此查询未触发工具调用")
     
     if all(success_checks) and tool_calls:
-        print("\n" + "=" * 60)
-        print("[SUCCESS] 流式实现测试通过！")
-        print("=" * 60)
+        print_section("[SUCCESS] 流式实现测试通过！", 60)
         return True
     else:
-        print("\n" + "=" * 60)
-        print("[INFO] 测试完成（部分功能未触发）")
-        print("=" * 60)
+        print_section("[INFO] 测试完成（部分功能未触发）", 60)
         return False
 
 if __name__ == '__main__':
@@ -14,7 +14,7 @@ load_dotenv()
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-from askdb_agno import create_agent
+from _shared import shared_agent
 
 def main():
     print("=" * 80)
@@ -22,7 +22,7 @@ def main():
     print("=" * 80)
     
     # 创建 Agent（启用调试和工具调用显示）
-    agent = create_agent(debug=False, enable_memory=True, session_id="tool_demo")
+    agent = shared_agent(enable_memory=True, session_id="tool_demo")
     
     # 测试查询（会触发工具调用）
     query = "列出数据库中的所有表"
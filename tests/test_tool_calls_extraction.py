@@ -3,10 +3,12 @@
 测试工具调用信息提取
 """
 
-import os
 import sys
 import json
+from collections import Counter, namedtuple
 from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, List, TypedDict
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,125 +17,140 @@ load_dotenv()
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-from askdb_agno import create_agent
+from agno.agent import RunContentEvent, ToolCallStartedEvent, ToolCallCompletedEvent
+from backend.tool_calls import extract_response_tool_calls
+from _shared import dumps_json, print_section, print_traceback, shared_agent
+
+
+# 非流式响应中工具调用对象的两种结构（提取函数按类型缓存，不同结构需要不同类型）
+FunctionCall = namedtuple('FunctionCall', 'function')
+NamedCall = namedtuple('NamedCall', 'name arguments')
+
+
+class ToolCallInfo(TypedDict):
+    """提取出的工具调用信息（与后端发送给前端的结构一致）"""
+    name: str
+    arguments: Any
+    result: Any
+
 
 def test_tool_calls():
-    print("=" * 80)
-    print("测试工具调用信息提取")
-    print("=" * 80)
+    print_section("测试工具调用信息提取", gap=False)
     
     # 创建 Agent
-    agent = create_agent(debug=False, enable_memory=False, session_id="test_tool_calls")
+    agent = shared_agent(session_id="test_tool_calls")
     
     # 测试查询（会触发工具调用）
     query = "列出数据库中的所有表"
     print(f"\n💬 用户查询: {query}\n")
     
-    # 执行查询
-    response = agent.run(query)
+    # 流式执行查询，边接收事件边提取工具调用
+    # 与后端 process_chat_message_stream 一样需要 stream_events=True 才会收到工具事件，
+    # 这里只记录名称、参数和结果，不含插入位置和确认状态
+    content_chunks = []
+    tool_calls: List[ToolCallInfo] = []
+    event_counts = Counter()
+    loads = json.loads
     
-    print("\n" + "=" * 80)
-    print("📊 响应分析")
-    print("=" * 80)
+    for chunk in agent.run(query, stream=True, stream_events=True):
+        event_counts[type(chunk).__name__] += 1
+        
+        if isinstance(chunk, RunContentEvent):
+            if chunk.content:
+                content_chunks.append(chunk.content)
+        
+        elif isinstance(chunk, ToolCallStartedEvent):
+            tool_name = getattr(chunk.tool, 'tool_name', '')
+            tool_args = getattr(chunk.tool, 'tool_args', {})
+            
+            if isinstance(tool_args, str):
+                try:
+                    tool_args = loads(tool_args)
+                except ValueError:
+                    pass
+            
+            tool_calls.append(ToolCallInfo(name=tool_name, arguments=tool_args, result=None))
+            
+            print(f"\n   ✅ 工具调用 #{len(tool_calls)}:")
+            print(f"     名称: {tool_name}")
+            print(f"     参数: {dumps_json(tool_args, default=str)[:200]}...")
+        
+        elif isinstance(chunk, ToolCallCompletedEvent):
+            tool_name = getattr(chunk.tool, 'tool_name', '')
+            for tc in tool_calls:
+                if tc['name'] == tool_name and tc['result'] is None:
+                    tc['result'] = getattr(chunk.tool, 'result', '')
+                    break
+    
+    content = ''.join(content_chunks)
+    
+    print_section("📊 响应分析")
     
     # 1. 检查响应内容
-    print(f"\n✅ 响应内容长度: {len(response.content)} 字符")
-    print(f"   前100字符: {response.content[:100]}...")
-    
-    # 2. 提取工具调用信息（模拟后端逻辑）
-    tool_calls = []
-    if hasattr(response, 'messages') and response.messages:
-        print(f"\n✅ 找到 {len(response.messages)} 条消息")
-        for msg_idx, msg in enumerate(response.messages):
-            print(f"\n   消息 #{msg_idx}:")
-            print(f"     - role: {getattr(msg, 'role', 'N/A')}")
-            
-            if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                print(f"     - 包含 {len(msg.tool_calls)} 个工具调用")
-                for call_idx, call in enumerate(msg.tool_calls):
-                    print(f"\n       工具调用对象类型: {type(call)}")
-                    
-                    # 如果是字典
-                    if isinstance(call, dict):
-                        print(f"       字典内容: {json.dumps(call, ensure_ascii=False, indent=10)[:500]}")
-                        
-                        # 提取信息
-                        if 'function' in call:
-                            func_data = call['function']
-                            func_name = func_data.get('name', '')
-                            func_args = func_data.get('arguments', {})
-                            
-                            if isinstance(func_args, str):
-                                try:
-                                    func_args = json.loads(func_args)
-                                except:
-                                    pass
-                            
-                            tool_call_info = {
-                                'name': func_name,
-                                'arguments': func_args
-                            }
-                            tool_calls.append(tool_call_info)
-                            
-                            print(f"\n       ✅ 工具调用 #{call_idx + 1}:")
-                            print(f"         名称: {func_name}")
-                            print(f"         参数: {json.dumps(func_args, ensure_ascii=False, indent=10)[:200]}...")
-                    
-                    # 如果是对象
-                    elif hasattr(call, 'function'):
-                        func = call.function
-                        args = func.arguments
-                        if isinstance(args, str):
-                            try:
-                                args = json.loads(args)
-                            except:
-                                pass
-                        
-                        tool_call_info = {
-                            'name': func.name,
-                            'arguments': args
-                        }
-                        tool_calls.append(tool_call_info)
-                        
-                        print(f"\n       ✅ 工具调用 #{call_idx + 1}:")
-                        print(f"         名称: {func.name}")
-                        print(f"         参数: {json.dumps(args, ensure_ascii=False, indent=10)[:200]}...")
-    else:
-        print("\n⚠️  response 没有 messages 属性")
+    print(f"\n✅ 响应内容长度: {len(content)} 字符")
+    print(f"   前100字符: {content[:100]}...")
     
     # 3. 输出最终结果
-    print("\n" + "=" * 80)
-    print("📦 提取的工具调用信息（将发送给前端）")
-    print("=" * 80)
+    print_section("📦 提取的工具调用信息（将发送给前端）")
     
     if tool_calls:
         print(f"\n✅ 成功提取 {len(tool_calls)} 个工具调用:\n")
-        print(json.dumps(tool_calls, ensure_ascii=False, indent=2))
+        print(dumps_json(tool_calls, default=str))
     else:
         print("\n⚠️  未提取到工具调用信息")
         print("   可能原因:")
         print("   1. 该查询不需要调用工具")
-        print("   2. 工具调用信息存储在其他位置")
-        print("   3. response 结构与预期不同")
-    
-    # 4. 检查 response 的所有属性
-    print("\n" + "=" * 80)
-    print("🔍 Response 对象的所有属性")
-    print("=" * 80)
-    print("\n可用属性:")
-    for attr in dir(response):
-        if not attr.startswith('_'):
-            print(f"  - {attr}")
-    
-    print("\n" + "=" * 80)
-    print("✅ 测试完成")
-    print("=" * 80)
+        print("   2. 工具调用事件未被发出")
+    
+    # 4. 事件统计
+    print_section("🔍 收到的事件类型")
+    for event_name, count in event_counts.most_common():
+        print(f"  - {event_name}: {count}")
+    
+    assert tool_calls, f"未提取到工具调用，收到的事件: {dict(event_counts)}"
+    assert all(tc['name'] for tc in tool_calls)
+    
+    print_section("✅ 测试完成")
+
+
+def test_response_messages_extraction():
+    """测试非流式响应（process_chat_message）从 response.messages 中提取工具调用"""
+    print_section("测试非流式响应的工具调用提取")
+    
+    response = SimpleNamespace(messages=[
+        SimpleNamespace(tool_calls=None),
+        SimpleNamespace(tool_calls=[
+            # OpenAI 格式的字典，参数为 JSON 字符串
+            {'type': 'function', 'function': {'name': 'list_tables', 'arguments': '{"schema": "main"}'}},
+            # 带 function 属性的对象
+            FunctionCall(function=NamedCall(name='describe_table', arguments={'table': 'users'})),
+        ]),
+        SimpleNamespace(tool_calls=[
+            # 带 name 属性的对象，参数不是合法 JSON 时原样保留
+            NamedCall(name='execute_query', arguments='SELECT 1'),
+            # 无法识别的结构会被跳过
+            {'id': 'call_without_function'},
+        ]),
+    ])
+    
+    tool_calls = extract_response_tool_calls(response)
+    print(dumps_json(tool_calls, default=str))
+    
+    assert tool_calls == [
+        {'name': 'list_tables', 'arguments': {'schema': 'main'}},
+        {'name': 'describe_table', 'arguments': {'table': 'users'}},
+        {'name': 'execute_query', 'arguments': 'SELECT 1'},
+    ]
+    assert extract_response_tool_calls(SimpleNamespace(messages=None)) == []
+    
+    print("\n✅ 非流式提取结果正确")
+
 
 if __name__ == "__main__":
     try:
+        test_response_messages_extraction()
         test_tool_calls()
     except Exception as e:
         print(f"\n❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        print_traceback()
 
@@ -5,35 +5,41 @@
 
 import requests
 import json
+from requests.adapters import HTTPAdapter
+
+from _shared import get_token
 
 BACKEND_URL = "http://localhost:8000"
 
+# 所有请求共用一个会话，keep-alive 复用到后端的连接
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
 def test_vector_search():
     """测试向量搜索API"""
     
-    # 1. 先登录获取token
+    # 1. 获取token（缓存未过期时不再登录）
     print("1️⃣  登录获取token...")
-    login_response = requests.post(
-        f"{BACKEND_URL}/api/auth/login",
-        json={"username": "admin", "password": "admin123"}
-    )
-    
-    if not login_response.ok:
-        print("❌ 登录失败")
-        print(login_response.json())
-        return
+    try:
+        token, login_data = get_token(SESSION, BACKEND_URL)
+    except RuntimeError as e:
+        print(f"❌ 登录失败: {e}")
+        raise
     
-    token = login_response.json().get("token")
-    print(f"✅ 登录成功，token: {token[:20]}...")
+    print(f"✅ {'登录成功' if login_data else '复用缓存的token'}，token: {token[:20]}...")
     
-    headers = {"Authorization": f"Bearer {token}"}
+    SESSION.headers["Authorization"] = f"Bearer {token}"
     
     # 2. 检查索引状态
     print("\n2️⃣  检查索引状态...")
-    status_response = requests.get(
-        f"{BACKEND_URL}/api/protected/index/status",
-        headers=headers
-    )
+    status_response = SESSION.get(f"{BACKEND_URL}/api/protected/index/status")
+    
+    # 缓存的 Token 被服务端拒绝（如密钥已更换）时重新登录一次
+    if status_response.status_code == 401 and login_data is None:
+        print("   缓存的token已失效，重新登录...")
+        token, _ = get_token(SESSION, BACKEND_URL, force=True)
+        SESSION.headers["Authorization"] = f"Bearer {token}"
+        status_response = SESSION.get(f"{BACKEND_URL}/api/protected/index/status")
     
     if status_response.ok:
         status_data = status_response.json()
@@ -83,39 +89,47 @@ def test_vector_search():
         }
     ]
     
-    for i, test_case in enumerate(test_cases, 1):
-        print(f"\n{i + 2}️⃣  {test_case['name']}")
-        print(f"   查询: '{test_case['query']}'")
-        
-        search_response = requests.post(
-            f"{BACKEND_URL}/api/protected/vector/search",
-            headers=headers,
-            json={
+    # 所有搜索合并成一次批量请求，服务端一起编码查询，结果按原顺序返回
+    batch_response = SESSION.post(
+        f"{BACKEND_URL}/api/protected/vector/search_batch",
+        json={"queries": [
+            {
                 "query": test_case["query"],
                 "top_k": test_case["top_k"],
                 "search_types": test_case["search_types"]
             }
-        )
+            for test_case in test_cases
+        ]}
+    )
+    
+    if not batch_response.ok:
+        print(f"\n❌ 批量搜索失败: {batch_response.status_code}")
+        print(f"   {batch_response.text}")
+        return
+    
+    batch_data = batch_response.json()
+    if not batch_data["success"]:
+        print(f"\n⚠️  {batch_data['message']}")
+        return
+    
+    for i, (test_case, data) in enumerate(zip(test_cases, batch_data["results"]), 1):
+        print(f"\n{i + 2}️⃣  {test_case['name']}")
+        print(f"   查询: '{test_case['query']}'")
         
-        if search_response.ok:
-            data = search_response.json()
-            if data["success"]:
-                print(f"   ✅ {data['message']}")
-                for j, result in enumerate(data["results"], 1):
-                    print(f"      {j}. [{result['type']}] {result['name']} (相似度: {result['similarity']:.4f})")
-                    if result['type'] == 'business_term':
-                        metadata = result['metadata']
-                        if metadata.get('definition'):
-                            print(f"         定义: {metadata['definition']}")
-                    elif result['type'] == 'table':
-                        metadata = result['metadata']
-                        if metadata.get('comment'):
-                            print(f"         说明: {metadata['comment']}")
-            else:
-                print(f"   ⚠️  {data['message']}")
+        if data["success"]:
+            print(f"   ✅ {data['message']}")
+            for j, result in enumerate(data["results"], 1):
+                print(f"      {j}. [{result['type']}] {result['name']} (相似度: {result['similarity']:.4f})")
+                if result['type'] == 'business_term':
+                    metadata = result['metadata']
+                    if metadata.get('definition'):
+                        print(f"         定义: {metadata['definition']}")
+                elif result['type'] == 'table':
+                    metadata = result['metadata']
+                    if metadata.get('comment'):
+                        print(f"         说明: {metadata['comment']}")
         else:
-            print(f"   ❌ 搜索失败: {search_response.status_code}")
-            print(f"      {search_response.text}")
+            print(f"   ⚠️  {data['message']}")
     
     print("\n" + "="*60)
     print("🎉 测试完成！")
@@ -128,7 +142,8 @@ def test_vector_search():
 
 if __name__ == "__main__":
     try:
-        test_vector_search()
+        with SESSION:
+            test_vector_search()
     except requests.exceptions.ConnectionError:
         print("❌ 无法连接到后端服务，请确保后端正在运行 (http://localhost:8000)")
     except Exception as e:
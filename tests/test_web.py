@@ -5,6 +5,8 @@
 """
 
 import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # 添加当前目录到路径
@@ -17,24 +19,38 @@ def test_web_search_integration():
     """测试Web搜索集成"""
     print("🧪 测试Web搜索集成...")
     
+    # 测试需要Web搜索的问题
+    test_questions = [
+        "什么是Python编程？",
+        "介绍一下东莞实验中学",
+        "腊肠的定义是什么？",
+        "最新的AI技术有哪些？"
+    ]
+    
     try:
-        # 创建代理
-        agent = create_agent(debug=False)
-        print("✅ Agent创建成功")
-        
-        # 测试需要Web搜索的问题
-        test_questions = [
-            "什么是Python编程？",
-            "介绍一下东莞实验中学",
-            "腊肠的定义是什么？",
-            "最新的AI技术有哪些？"
+        # 每个问题使用独立会话的 Agent，并发执行时互不共享会话状态；
+        # 会话 ID 带本次运行的随机后缀，避免读到之前运行留在记忆中的历史
+        run_id = uuid.uuid4().hex[:8]
+        agents = [
+            create_agent(enable_memory=True, session_id=f"test_web_{run_id}_{i}")
+            for i in range(len(test_questions))
         ]
-        
-        for question in test_questions:
+        print("✅ Agent创建成功")
+    except Exception as e:
+        print(f"❌ 测试失败: {e}")
+        return False
+    
+    # 各问题互不依赖，并发执行，按完成顺序输出
+    with ThreadPoolExecutor(max_workers=len(test_questions)) as executor:
+        futures = {
+            executor.submit(agent.run, question): question
+            for agent, question in zip(agents, test_questions)
+        }
+        for future in as_completed(futures):
+            question = futures[future]
             print(f"\n🔍 测试问题: {question}")
             try:
-                response = agent.run(question)
-                content = response.content
+                content = future.result().content
                 
                 print(f"✅ 响应长度: {len(content)} 字符")
                 print(f"📄 响应预览: {content[:200]}...")
@@ -47,12 +63,8 @@ def test_web_search_integration():
                     
             except Exception as e:
                 print(f"❌ 问题处理失败: {e}")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ 测试失败: {e}")
-        return False
+    
+    return True
 
 if __name__ == "__main__":
     if test_web_search_integration():
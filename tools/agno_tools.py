@@ -8,8 +8,10 @@ AskDB Agno Tools - 修复版
 import os
 import json
 import logging
+import time
 from typing import Optional, Dict, Any, List
 
+import sqlparse
 from agno.tools import Toolkit
 from sqlalchemy import create_engine, text, inspect
 from sqlalchemy.engine import Engine
@@ -24,6 +26,14 @@ from rich.console import Console
 logger = logging.getLogger(__name__)
 console = Console()
 
+# 会改变表列表的语句类型；sqlparse 识别不了的语句（如 MySQL 的 RENAME TABLE）为 UNKNOWN，保守地也视为 DDL
+SCHEMA_CHANGING_TYPES = frozenset(("CREATE", "DROP", "ALTER", "UNKNOWN"))
+
+
+def _changes_schema(sql: str) -> bool:
+    """按 sqlparse 解析出的语句类型判断 SQL 是否可能改变表结构（不受字面量和列名中关键字的影响）"""
+    return any(statement.get_type() in SCHEMA_CHANGING_TYPES for statement in sqlparse.parse(sql))
+
 
 class DatabaseConnection:
     """数据库连接管理器"""
@@ -37,6 +47,9 @@ class DatabaseConnection:
         self._semantic_search_enabled = os.getenv("ENABLE_SEMANTIC_SEARCH", "false").lower() == "true"
         self._schema_initialized = False
         self._current_user_context: Optional[Dict[str, Any]] = None
+        # 表名列表缓存：(表名列表, 获取时间)；经本连接执行 DDL 或重新连接时失效
+        self._tables_cache: Optional[tuple] = None
+        self._tables_cache_ttl = float(os.getenv("SCHEMA_CACHE_TTL", "60"))
     
     def connect(self) -> bool:
         """连接数据库"""
@@ -80,6 +93,8 @@ class DatabaseConnection:
             else:
                 self.engine = create_engine(url)
             
+            self._tables_cache = None
+            
             # 测试连接
             with self.engine.connect() as conn:
                 result = conn.execute(text("SELECT 1"))
@@ -177,6 +192,8 @@ class DatabaseConnection:
                     return response
                 else:
                     conn.commit()
+                    if _changes_schema(sql):
+                        self._tables_cache = None
                     response = {
                         "success": True,
                         "data": [],
@@ -195,11 +212,17 @@ class DatabaseConnection:
             }
     
     def get_tables(self) -> list:
-        """获取表列表"""
+        """获取表列表（短时间内重复调用直接返回缓存，不再扫描数据库目录）"""
         if not self.is_connected:
             self.connect()
+        cached = self._tables_cache
+        if cached is not None and time.monotonic() - cached[1] < self._tables_cache_ttl:
+            return list(cached[0])
+        
         inspector = inspect(self.engine)
-        return inspector.get_table_names()
+        tables = inspector.get_table_names()
+        self._tables_cache = (tuple(tables), time.monotonic())
+        return tables
     
     def get_table_info(self, table_name: str) -> dict:
         """获取表信息"""
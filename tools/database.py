@@ -142,7 +142,7 @@ class DatabaseTool:
         if not self.is_connected:
             raise DatabaseConnectionError("Database not connected")
         
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             with self.engine.connect() as conn:
@@ -164,7 +164,7 @@ class DatabaseTool:
                     columns = []
                     row_count = result.rowcount
                 
-                execution_time = time.time() - start_time
+                execution_time = time.perf_counter() - start_time
                 
                 logger.info(f"Query executed successfully in {execution_time:.3f}s, {row_count} rows affected")
                 
@@ -179,7 +179,7 @@ class DatabaseTool:
                 }
                 
         except SQLAlchemyError as e:
-            execution_time = time.time() - start_time
+            execution_time = time.perf_counter() - start_time
             error_msg = str(e)
             logger.error(f"Query execution failed: {error_msg}")
             
@@ -9,9 +9,11 @@ import json
 import logging
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 from sqlalchemy.engine import Engine
 from sqlalchemy import inspect, text
 
@@ -43,6 +45,10 @@ class VectorStore:
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(parents=True, exist_ok=True)
         
+        # 三个集合共用同一个嵌入函数；查询向量按文本缓存，重复查询不再重新编码
+        self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self._embed_query = lru_cache(maxsize=256)(self._compute_query_embedding)
+        
         try:
             # 初始化 ChromaDB 客户端
             self.client = chromadb.PersistentClient(
@@ -57,17 +63,20 @@ class VectorStore:
             # 注意：如果已有旧的collection使用L2距离，需要清空后重建才能生效
             self.tables_collection = self.client.get_or_create_collection(
                 name="tables",
-                metadata={"hnsw:space": "cosine"}
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=self._embedding_function
             )
             
             self.columns_collection = self.client.get_or_create_collection(
                 name="columns",
-                metadata={"hnsw:space": "cosine"}
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=self._embedding_function
             )
             
             self.business_terms_collection = self.client.get_or_create_collection(
                 name="business_terms",
-                metadata={"hnsw:space": "cosine"}
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=self._embedding_function
             )
             
             logger.info(f"✅ VectorStore initialized at {self.persist_directory}")
@@ -76,6 +85,10 @@ class VectorStore:
             logger.error(f"Failed to initialize VectorStore: {e}")
             raise
     
+    def _compute_query_embedding(self, query: str):
+        """计算查询文本的向量"""
+        return self._embedding_function([query])[0]
+    
     def get_index_stats(self) -> Dict[str, int]:
         """
         获取索引统计信息
@@ -336,6 +349,13 @@ class VectorStore:
             logger.error(f"Failed to index business terms: {e}")
             return 0
     
+    # 各类型对应的集合属性名，以及如何从元数据得到结果名称
+    _SEARCH_TARGETS = {
+        "table": ("tables_collection", lambda m: m['table_name']),
+        "column": ("columns_collection", lambda m: f"{m['table_name']}.{m['column_name']}"),
+        "business_term": ("business_terms_collection", lambda m: m['term_name']),
+    }
+    
     def search(self, query: str, top_k: int = 5, 
               search_types: List[str] = None) -> List[SearchResult]:
         """
@@ -349,92 +369,86 @@ class VectorStore:
         Returns:
             SearchResult 列表
         """
-        if search_types is None:
-            search_types = ["table", "column", "business_term"]
-        
-        results = []
-        
         try:
-            # 搜索表
-            if "table" in search_types:
-                try:
-                    table_results = self.tables_collection.query(
-                        query_texts=[query],
-                        n_results=min(top_k, self.tables_collection.count()) if self.tables_collection.count() > 0 else 1
-                    )
-                    
-                    if table_results['ids'] and table_results['ids'][0]:
-                        for i, doc_id in enumerate(table_results['ids'][0]):
-                            metadata = table_results['metadatas'][0][i]
-                            distance = table_results['distances'][0][i]
-                            # 使用更鲁棒的相似度计算：1 / (1 + distance)
-                            # 这样distance=0时similarity=1, distance越大similarity越接近0
-                            similarity = 1.0 / (1.0 + distance)
-                            
-                            results.append(SearchResult(
-                                name=metadata['table_name'],
-                                item_type="table",
-                                similarity=similarity,
-                                metadata=metadata
-                            ))
-                except Exception as e:
-                    logger.debug(f"Table search error: {e}")
-            
-            # 搜索列
-            if "column" in search_types:
-                try:
-                    column_results = self.columns_collection.query(
-                        query_texts=[query],
-                        n_results=min(top_k, self.columns_collection.count()) if self.columns_collection.count() > 0 else 1
-                    )
-                    
-                    if column_results['ids'] and column_results['ids'][0]:
-                        for i, doc_id in enumerate(column_results['ids'][0]):
-                            metadata = column_results['metadatas'][0][i]
-                            distance = column_results['distances'][0][i]
-                            similarity = 1.0 / (1.0 + distance)
-                            
-                            results.append(SearchResult(
-                                name=f"{metadata['table_name']}.{metadata['column_name']}",
-                                item_type="column",
-                                similarity=similarity,
-                                metadata=metadata
-                            ))
-                except Exception as e:
-                    logger.debug(f"Column search error: {e}")
-            
-            # 搜索业务术语
-            if "business_term" in search_types:
-                try:
-                    term_results = self.business_terms_collection.query(
-                        query_texts=[query],
-                        n_results=min(top_k, self.business_terms_collection.count()) if self.business_terms_collection.count() > 0 else 1
-                    )
-                    
-                    if term_results['ids'] and term_results['ids'][0]:
-                        for i, doc_id in enumerate(term_results['ids'][0]):
-                            metadata = term_results['metadatas'][0][i]
-                            distance = term_results['distances'][0][i]
-                            similarity = 1.0 / (1.0 + distance)
-                            
-                            results.append(SearchResult(
-                                name=metadata['term_name'],
-                                item_type="business_term",
-                                similarity=similarity,
-                                metadata=metadata
-                            ))
-                except Exception as e:
-                    logger.debug(f"Business term search error: {e}")
-            
-            # 按相似度排序
-            results.sort(key=lambda x: x.similarity, reverse=True)
-            
-            return results[:top_k]
-            
+            # 查询向量只计算一次，三类集合共用
+            query_embedding = self._embed_query(query)
+            return self._search_embeddings([query_embedding], [(top_k, search_types)])[0]
         except Exception as e:
             logger.error(f"Search failed: {e}")
             return []
     
+    def search_batch(self, queries: List[Dict[str, Any]]) -> List[List[SearchResult]]:
+        """
+        批量语义搜索：所有查询文本一次编码，每个集合只查询一次
+        
+        Args:
+            queries: 查询列表，每项包含 query、top_k（可选）、search_types（可选）
+            
+        Returns:
+            与 queries 顺序一致的 SearchResult 列表
+        """
+        if not queries:
+            return []
+        
+        try:
+            texts = list(dict.fromkeys(q["query"] for q in queries))
+            vectors = dict(zip(texts, self._embedding_function(texts)))
+            return self._search_embeddings(
+                [vectors[q["query"]] for q in queries],
+                [(q.get("top_k") or 5, q.get("search_types")) for q in queries]
+            )
+        except Exception as e:
+            logger.error(f"Batch search failed: {e}")
+            return [[] for _ in queries]
+    
+    def _search_embeddings(self, embeddings: list, specs: List[tuple]) -> List[List[SearchResult]]:
+        """
+        用已计算的查询向量检索各集合
+        
+        Args:
+            embeddings: 查询向量列表
+            specs: 与 embeddings 对应的 (top_k, search_types) 列表
+        """
+        results = [[] for _ in embeddings]
+        
+        for item_type, (attr, name_of) in self._SEARCH_TARGETS.items():
+            # 需要搜索该类型的查询
+            rows = [i for i, (_, types) in enumerate(specs) if types is None or item_type in types]
+            if not rows:
+                continue
+            
+            try:
+                collection = getattr(self, attr)
+                count = collection.count()
+                max_k = max(specs[i][0] for i in rows)
+                hits = collection.query(
+                    query_embeddings=[embeddings[i] for i in rows],
+                    n_results=min(max_k, count) if count > 0 else 1
+                )
+                
+                if not hits['ids']:
+                    continue
+                for row, ids, metadatas, distances in zip(rows, hits['ids'], hits['metadatas'], hits['distances']):
+                    top_k = specs[row][0]
+                    for metadata, distance in list(zip(metadatas, distances))[:top_k]:
+                        # 使用更鲁棒的相似度计算：1 / (1 + distance)
+                        # 这样distance=0时similarity=1, distance越大similarity越接近0
+                        results[row].append(SearchResult(
+                            name=name_of(metadata),
+                            item_type=item_type,
+                            similarity=1.0 / (1.0 + distance),
+                            metadata=metadata
+                        ))
+            except Exception as e:
+                logger.debug(f"{item_type} search error: {e}")
+        
+        # 按相似度排序
+        for row, (top_k, _) in enumerate(specs):
+            results[row].sort(key=lambda x: x.similarity, reverse=True)
+            del results[row][top_k:]
+        
+        return results
+    
     def clear_all_indexes(self):
         """清空所有索引"""
         try:
@@ -443,9 +457,15 @@ class VectorStore:
             self.client.delete_collection("business_terms")
             
             # 重新创建集合
-            self.tables_collection = self.client.get_or_create_collection("tables")
-            self.columns_collection = self.client.get_or_create_collection("columns")
-            self.business_terms_collection = self.client.get_or_create_collection("business_terms")
+            self.tables_collection = self.client.get_or_create_collection(
+                "tables", embedding_function=self._embedding_function
+            )
+            self.columns_collection = self.client.get_or_create_collection(
+                "columns", embedding_function=self._embedding_function
+            )
+            self.business_terms_collection = self.client.get_or_create_collection(
+                "business_terms", embedding_function=self._embedding_function
+            )
             
             logger.info("✅ All indexes cleared")
         except Exception as e:
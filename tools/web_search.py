@@ -14,12 +14,37 @@ from typing import List, Dict, Any, Optional, Union
 from dataclasses import dataclass
 from urllib.parse import urlencode, quote_plus
 import time
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 import os
-import nest_asyncio  # 添加nest_asyncio修复事件循环冲突
 
 logger = logging.getLogger(__name__)
 
+# 同步搜索等待结果的最长时间（秒），超时后取消请求并返回空结果
+SEARCH_SYNC_TIMEOUT = float(os.getenv("WEB_SEARCH_TIMEOUT", "30"))
+
+# 同步搜索共用的后台事件循环（惰性创建，进程内只启动一次）
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_THREAD: Optional[threading.Thread] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop used by synchronous search calls."""
+    global _LOOP, _LOOP_THREAD
+    
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed() or not _LOOP_THREAD.is_alive():
+            _LOOP = asyncio.new_event_loop()
+            _LOOP_THREAD = threading.Thread(
+                target=_LOOP.run_forever,
+                name="web-search-loop",
+                daemon=True
+            )
+            _LOOP_THREAD.start()
+        return _LOOP
+
 
 @dataclass
 class SearchResult:
@@ -259,11 +284,6 @@ class WebSearchTool:
         self.provider_name = provider or os.getenv("WEB_SEARCH_PROVIDER", "duckduckgo")
         self.provider = self._create_provider(**kwargs)
         self._session = None
-        
-        try:
-            nest_asyncio.apply()
-        except Exception as e:
-            logger.warning(f"⚠️ nest_asyncio补丁应用失败: {e}")
     
     def _create_provider(self, **kwargs) -> BaseWebSearchProvider:
         """Create search provider based on configuration."""
@@ -301,37 +321,22 @@ class WebSearchTool:
                 raise WebSearchError(f"Search failed: {e}")
     
     def search_sync(self, query: str, max_results: int = 10, **kwargs) -> List[SearchResult]:
-        """同步版本的Web搜索 - 修复事件循环问题"""
+        """同步版本的Web搜索 - 将协程投递到共享的后台事件循环，避免每次调用都新建事件循环"""
         try:
-            # 创建新的事件循环，避免冲突
-            import asyncio
-            
-            # 应用nest_asyncio补丁，允许嵌套事件循环
-            try:
-                nest_asyncio.apply()
-            except Exception as e:
-                logger.warning(f"nest_asyncio补丁应用失败: {e}")
-            
-            # 创建新的事件循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                # 执行异步搜索
-                results = loop.run_until_complete(
-                    self.search(query, max_results=max_results, **kwargs)
-                )
-                logger.info(f"✅ 同步Web搜索成功: 找到 {len(results)} 个结果")
-                return results
-            except Exception as e:
-                logger.error(f"同步Web搜索执行失败: {e}")
-                # 返回空结果而不是抛出异常
-                return []
-            finally:
-                loop.close()
-                
+            future = asyncio.run_coroutine_threadsafe(
+                self.search(query, max_results=max_results, **kwargs),
+                _get_background_loop()
+            )
+            results = future.result(timeout=SEARCH_SYNC_TIMEOUT)
+            logger.info(f"✅ 同步Web搜索成功: 找到 {len(results)} 个结果")
+            return results
+        except FutureTimeoutError:
+            # 取消后台循环中仍在进行的请求，避免挂起的请求一直占用共享循环
+            future.cancel()
+            logger.error(f"同步Web搜索超时（{SEARCH_SYNC_TIMEOUT}秒）: {query}")
+            return []
         except Exception as e:
-            logger.error(f"同步Web搜索失败: {e}")
+            logger.error(f"同步Web搜索执行失败: {e}")
             # 返回空结果而不是抛出异常
             return []
     
@@ -491,13 +496,6 @@ def test_web_search():
 
 
 if __name__ == "__main__":
-    # 安装必要的依赖
-    try:
-        import nest_asyncio
-        print("✅ nest_asyncio 已安装")
-    except ImportError:
-        print("❌ 请安装 nest_asyncio: pip install nest_asyncio")
-    
     # 测试Web搜索
     if test_web_search():
         print("🎉 Web搜索功能正常！")